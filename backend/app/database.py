@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, text
+from sqlalchemy import create_engine, event, Column, Integer, String, Text, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+from pgvector.psycopg2 import register_vector
+
+from logger import get_logger
+
+logger = get_logger("database")
 
 # Database URLs
 ADMIN_DATABASE_URL = os.getenv('ADMIN_DATABASE_URL')
@@ -17,8 +22,21 @@ SessionLocalAdmin = sessionmaker(autocommit=False, autoflush=False, bind=admin_e
 chat_engine = create_engine(CHAT_DATABASE_URL, connect_args={})
 SessionLocalChat = sessionmaker(autocommit=False, autoflush=False, bind=chat_engine)
 
-#collections_engine = create_engine(COLLECTIONS_DATABASE_URL, connect_args={})
-#SessionLocalCollections = sessionmaker(autocommit=False, autoflush=False, bind=collections_engine)
+# Collections database is only needed when collections/embeddings are enabled
+collections_engine = None
+SessionLocalCollections = None
+if COLLECTIONS_DATABASE_URL:
+    collections_engine = create_engine(COLLECTIONS_DATABASE_URL, connect_args={})
+    SessionLocalCollections = sessionmaker(autocommit=False, autoflush=False, bind=collections_engine)
+
+    @event.listens_for(collections_engine, "connect")
+    def register_vector_type(dbapi_connection, connection_record):
+        """Bind NumPy arrays as pgvector values and read vectors back as NumPy arrays"""
+        try:
+            register_vector(dbapi_connection)
+        except Exception as e:
+            # The vector extension doesn't exist yet; vector_search creates it on startup
+            logger.warning(f"Could not register pgvector type on collections connection: {e}")
 
 # Create bases
 AdminBase = declarative_base()
@@ -40,3 +58,11 @@ def get_chat_db():
     finally:
         db.close()
 
+def get_collections_db():
+    if SessionLocalCollections is None:
+        raise RuntimeError("COLLECTIONS_DATABASE_URL is not configured")
+    db = SessionLocalCollections()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -4,8 +4,7 @@ import sys
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from routers import chat, history, health, auth, admin, chat_history, projects
-#, embeddings
+from routers import chat, history, health, auth, admin, chat_history, projects, collections, embeddings
 from database import get_chat_db, get_admin_db
 from db.init_admin import init_admin  # Import the initialization function
 import asyncio
@@ -69,6 +68,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination cursor on list endpoints
 )
 
 # Register API routers
@@ -79,8 +79,8 @@ app.include_router(health.router, prefix="", tags=["Health"])
 app.include_router(admin.router, prefix="", tags=["Admin"])
 app.include_router(chat_history.router, prefix="", tags=["chat_history"])
 app.include_router(projects.router, prefix="", tags=["Projects"])
-#app.include_router(collections.router,prefix="", tags=["collections"])
-#app.include_router(embeddings.router, prefix="", tags=["embeddings"])
+app.include_router(collections.router, prefix="", tags=["collections"])
+app.include_router(embeddings.router, prefix="", tags=["embeddings"])
 
 if __name__ == "__main__":
     uvicorn.run(
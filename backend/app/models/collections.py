@@ -1,6 +1,6 @@
 from sqlalchemy import Column, String, Integer, Text, Boolean, DateTime, ForeignKey, BigInteger, TIMESTAMP, func
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB
-from typing import List, Optional
+from typing import List, Optional, Literal
 import uuid
 import os
 from datetime import datetime
@@ -22,6 +22,8 @@ class Collection(CollectionsBase):
     type = Column(Text, nullable=False)
     description = Column(Text)
     is_encrypted = Column(Boolean, default=True)  # Added encryption flag, default to True
+    embedding_storage = Column(Text, nullable=False, default="vector")  # vector, halfvec or bit ANN index
+    version = Column(BigInteger, nullable=False, default=0)  # bumped by the embedding worker on content changes
     created_at = Column(TIMESTAMP, default=datetime.utcnow)
     updated_at = Column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -61,6 +63,7 @@ class Document(CollectionsBase):
     file_path = Column(Text, nullable=False)
     content_type = Column(Text)
     is_encrypted = Column(Boolean, default=False)
+    content_hash = Column(Text, index=True)  # sha256 of the file; names its blob in the content-addressed store
     created_at = Column(TIMESTAMP, default=datetime.utcnow)
     updated_at = Column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
     status = Column(Text)
@@ -73,11 +76,13 @@ class DocumentChunk(CollectionsBase):
     __table_args__ = {"schema": "collections"}
     
     id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Partition key of document_chunks; part of the primary key
+    collection_id = Column(PG_UUID(as_uuid=True), ForeignKey("collections.collections.id", ondelete="CASCADE"), primary_key=True)
     document_id = Column(PG_UUID(as_uuid=True), ForeignKey("collections.documents.id", ondelete="CASCADE"), nullable=False)
     chunk_index = Column(Integer, nullable=False)
     chunk_text = Column(Text, nullable=False)
-    # Renamed from 'metadata' to 'chunk_metadata' to avoid conflict
-    chunk_metadata = Column(JSONB)
+    # Renamed from 'metadata' to 'chunk_metadata' to avoid conflict; holds the chunk's content_hash
+    chunk_metadata = Column("metadata", JSONB)
     created_at = Column(TIMESTAMP, default=datetime.utcnow)
     updated_at = Column(TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -88,6 +93,8 @@ class CollectionBase(BaseModel):
     name: str
     type: str
     description: Optional[str] = None
+    # Precision of the ANN index; halfvec/bit shrink it 2x/32x and re-rank with full vectors
+    embedding_storage: Literal["vector", "halfvec", "bit"] = "vector"
 
 class CollectionCreate(CollectionBase):
     pass
@@ -122,4 +129,29 @@ class DocumentResponse(DocumentBase):
     
     class Config:
         orm_mode = True
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int = Field(..., ge=0)  # total bytes the client will send
+    content_type: Optional[str] = None
+
+class UploadSessionResponse(BaseModel):
+    upload_id: UUID
+    collection_id: UUID
+    filename: str
+    size: int
+    offset: int  # bytes received so far; the next PUT starts here
+    chunk_size: int  # suggested bytes per PUT
+
+class UploadComplete(BaseModel):
+    sha256: Optional[str] = None  # verified against the hash computed during upload when given
+
+class UploadCompleteResponse(DocumentResponse):
+    sha256: str
+    task_id: str
+
+class BulkUploadResponse(BaseModel):
+    documents: List[DocumentResponse]
+    task_id: str  # one embedding task covering every new document
+    skipped: List[str] = []  # archive members that are not documents (directories' metadata, hidden files)
@@ -8,7 +8,6 @@ from utils.security import hash_password
 from pydantic import BaseModel, EmailStr
 from jose import jwt, JWTError
 import os
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordBearer
 from common.curr_user import get_current_user
@@ -20,7 +19,7 @@ from pydantic import BaseModel
 from typing import Optional
 import time
 from fastapi import Depends, HTTPException, Request, status
-from utils.security import hash_password, verify_password
+from utils.security import hash_password, verify_password, verify_and_update_password
 
 # Rate limiting variables for enhanced security
 PASSWORD_ATTEMPT_LIMIT = 5
@@ -32,7 +31,6 @@ password_attempts = {}  # user_id: {"count": 0, "lockout_until": timestamp}
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 5
 REFRESH_ACCESS_TOKEN_EXPIRE_DAYS=1
@@ -128,17 +126,20 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)  # ✅ Fix here
-# ✅ Verify Password
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
 @router.post("/login")
 def login_user(response: Response, login_data: LoginRequest, db: Session = Depends(get_admin_db)):
     user = db.query(User).filter(User.email == login_data.email).first()
-    if not user or not verify_password(login_data.password, user.password_hash):
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    valid, new_hash = verify_and_update_password(login_data.password, user.password_hash)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash predates the current BCRYPT_ROUNDS
+        user.password_hash = new_hash
+        db.commit()
 
     access_token = create_access_token(data={"sub": user.email, "role": "admin" if user.is_admin else "user"}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     refresh_token = create_access_token(data={"sub": user.email}, expires_delta=timedelta(days=REFRESH_ACCESS_TOKEN_EXPIRE_DAYS))  
@@ -28,7 +28,8 @@ from logger import get_logger
 from utils.file_processing import process_file_context, process_file_content, save_document, get_document, get_chat_documents
 
 from services.stream_service import *
-from services.vector_search import *
+from services.vector_search import authorize_collections, retrieve_collections_context
+from services.project_context import project_context_cache
 
 router = APIRouter()
 logger = get_logger("chat")
@@ -87,6 +88,7 @@ class ChatRequest(BaseModel):
     use_cpu: Optional[bool] = None  # Optional override
     files: Optional[List[dict]] = None
     collection: Optional[dict] = None
+    collections: Optional[List[dict]] = None  # search several collections at once
 
 class ChatCreate(BaseModel):
     name: Optional[str] = "New Chat"
@@ -276,6 +278,24 @@ def clean_final_response(text: str) -> str:
     return text
 
 # =============== Streaming Endpoint ===============
+async def get_collection_context(db: Session, request: ChatRequest) -> Optional[str]:
+    """Retrieved context from the request's collections that the chat owner may read, if any"""
+    collection_ids = [c.get("id") for c in ([request.collection] if request.collection else []) + (request.collections or [])]
+    collection_ids = [collection_id for collection_id in collection_ids if collection_id]
+    if not collection_ids:
+        return None
+    chat_owner = db.execute(
+        text("SELECT user_id FROM chat.chats WHERE chat_id = :chat_id"),
+        {"chat_id": request.chat_id}
+    ).scalar()
+    # One ownership check for all requested collections
+    owned_ids = authorize_collections(collection_ids, chat_owner) if chat_owner else []
+    if len(owned_ids) < len(collection_ids):
+        logger.warning(f"Ignoring collections not owned by chat owner: {set(collection_ids) - set(owned_ids)}")
+    if not owned_ids:
+        return None
+    return await retrieve_collections_context(owned_ids, request.prompt)
+
 @router.post("/generate_stream")
 async def generate_stream(request: ChatRequest, db: Session = Depends(get_admin_db)):
     """
@@ -286,6 +306,7 @@ async def generate_stream(request: ChatRequest, db: Session = Depends(get_admin_
     logger.debug(f"Request chat_id: {request.chat_id}, Prompt: {request.prompt[:50]}...")
     logger.debug(f"Has files: {request.files is not None}, Has collection: {request.collection is not None}")
     if request.collection: logger.debug(f"Collection: {request.collection.get('id', 'N/A')}")
+    if request.collections: logger.debug(f"Collections: {[c.get('id', 'N/A') for c in request.collections]}")
     logger.debug("==========================================\n")
     
     # Verify chat exists (or handle creation implicitly? Check save_messages_to_db)
@@ -330,12 +351,22 @@ async def generate_stream(request: ChatRequest, db: Session = Depends(get_admin_
 
     # 1. System Prompt
     prompt_parts.append(SYSTEM_PROMPT)
+
+    # 2. Project instructions and documents. Identical for every chat in the project and placed
+    # before anything chat-specific, so the model server can reuse its cached prefix.
+    try:
+        project_context = project_context_cache.get_for_chat(db, request.chat_id)
+        if project_context:
+            prompt_parts.append(project_context.text)
+            logger.debug(f"Added project {project_context.project_id} prefix ({project_context.token_count} tokens)")
+    except Exception as e:
+        logger.error(f"Error loading project context for chat {request.chat_id}: {e}", exc_info=True)
     
-    # 2. Add previously saved document content (if any)
+    # 3. Add previously saved document content (if any)
     if documents_content:
         prompt_parts.append(f"\n\nPreviously Uploaded Documents:\n{documents_content}")
     
-    # 3. Process file context (if provided in the JSON request body)
+    # 4. Process file context (if provided in the JSON request body)
     file_context_str = ""
     if request.files:
         try:
@@ -353,12 +384,21 @@ async def generate_stream(request: ChatRequest, db: Session = Depends(get_admin_
             # Optionally add an error message to the context?
             # prompt_parts.append("\n\n[Error processing attached files]" )
     
-    # 4. Chat History
+    # 5. Collection context (single collection or several at once)
+    try:
+        collection_context = await get_collection_context(db, request)
+        if collection_context:
+            prompt_parts.append(f"\n\nCollection Context:\n{collection_context}")
+    except Exception as e:
+        logger.error(f"Error retrieving collection context: {e}", exc_info=True)
+        # Continue without collection context if there's an error
+    
+    # 6. Chat History
     formatted_history = format_chat_history_for_prompt(messages) # Use renamed function
     if formatted_history:
         prompt_parts.append(f"\n\nChat History:\n{formatted_history}") # Add separator
 
-    # 5. Current User Prompt
+    # 7. Current User Prompt
     # Add an indicator if files were attached
     if request.files:
         request.prompt = f'{request.prompt}  📁 {len(request.files)} files added'
@@ -366,7 +406,7 @@ async def generate_stream(request: ChatRequest, db: Session = Depends(get_admin_
 
     prompt_parts.append(f'\n\nCurrent Prompt:\nUser: {request.prompt}') # Regular prompt
     
-    # 6. Assistant Trigger
+    # 8. Assistant Trigger
     prompt_parts.append(f'\nAssistant: ')
 
     # Combine all parts
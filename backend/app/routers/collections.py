@@ -1,5 +1,4 @@
-'''
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Query
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Query, Request, Response
 from sqlalchemy import Column, String, Integer, Text, Boolean, DateTime, ForeignKey, BigInteger, TIMESTAMP, func
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID, JSONB
 from typing import List, Optional
@@ -7,19 +6,37 @@ import uuid
 import os
 from datetime import datetime
 import shutil
+import asyncio
+import hashlib
+import contextlib
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import json
+import base64
+import redis
 from logger import get_logger
 
 # Import database connections
 from database import get_collections_db, CollectionsBase
 from sqlalchemy.orm import relationship, Session
+from sqlalchemy import text as sql_text, tuple_
 from models.collections import *
 
 # Auth imports
 from common.curr_user import get_current_user
 from data_models import User
 
+# Embedding task queue
+from routers.embeddings import queue_document_tasks
+
+# Content-addressed file storage
+from utils.blob_store import ingest_file
+
+# Retrieval results are cached per collection version
+from services.retrieval_cache import bump_collection_version, publish_collection_version
+
 # Schemas
 from pydantic import BaseModel, Field
 from typing import List, Optional
@@ -28,6 +45,30 @@ from uuid import UUID
 # UPLOAD_DIR setup
 DATA_DIR = os.getenv('DATA_DIR', ".")
 os.makedirs(DATA_DIR, exist_ok=True)
+UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")  # partial files of resumable uploads
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# Upload settings
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(1024 * 1024 * 1024)))  # bytes per document
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))  # suggested PUT size for clients
+UPLOAD_READ_SIZE = 1024 * 1024  # bytes read from the request per write
+UPLOAD_WRITE_THREADS = int(os.getenv("UPLOAD_WRITE_THREADS", "4"))
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))  # seconds an idle session is kept
+UPLOAD_LOCK_TIMEOUT = int(os.getenv("UPLOAD_LOCK_TIMEOUT", "600"))  # seconds one PUT may hold an upload
+DOCUMENTS_PAGE_SIZE = int(os.getenv("DOCUMENTS_PAGE_SIZE", "100"))
+MAX_DOCUMENTS_PAGE_SIZE = 1000
+MAX_BULK_FILES = int(os.getenv("MAX_BULK_FILES", "5000"))  # documents per bulk or archive request
+MAX_ARCHIVE_EXPANDED_SIZE = int(os.getenv("MAX_ARCHIVE_EXPANDED_SIZE", str(10 * 1024 * 1024 * 1024)))  # bytes unpacked
+
+# Redis setup
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+redis_client = redis.from_url(REDIS_URL)
+
+# File writes and hashing run here so they never block the event loop
+upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_WRITE_THREADS, thread_name_prefix="upload")
+
+# upload_id -> (sha256 object, offset it covers); rebuilt from the partial file if missing
+upload_hashers = {}
 
 # Get logger for this module
 logger = get_logger("collections")
@@ -60,12 +101,22 @@ async def get_collections(
     user: User = Depends(get_current_user),
     db: Session = Depends(get_collections_db)
 ):
-    collections = db.query(Collection).filter(Collection.user_id == user.id).all()
+    # Document counts for all the user's collections in the same query
+    doc_counts = db.query(
+        Document.collection_id,
+        func.count(Document.id).label("document_count")
+    ).join(Collection, Document.collection_id == Collection.id).filter(
+        Collection.user_id == user.id
+    ).group_by(Document.collection_id).subquery()
     
-    # Add document count for each collection
-    for collection in collections:
-        doc_count = db.query(Document).filter(Document.collection_id == collection.id).count()
+    rows = db.query(Collection, func.coalesce(doc_counts.c.document_count, 0)).outerjoin(
+        doc_counts, doc_counts.c.collection_id == Collection.id
+    ).filter(Collection.user_id == user.id).all()
+    
+    collections = []
+    for collection, doc_count in rows:
         setattr(collection, 'document_count', doc_count)
+        collections.append(collection)
     
     return collections
 
@@ -75,22 +126,193 @@ async def get_collection(
     user: User = Depends(get_current_user),
     db: Session = Depends(get_collections_db)
 ):
-    collection = db.query(Collection).filter(
+    doc_count = db.query(func.count(Document.id)).filter(
+        Document.collection_id == Collection.id
+    ).correlate(Collection).scalar_subquery()
+    
+    row = db.query(Collection, doc_count).filter(
         Collection.id == collection_id,
         Collection.user_id == user.id  # Ensure the collection belongs to the user
     ).first()
     
-    if not collection:
+    if not row:
         raise HTTPException(status_code=404, detail="Collection not found")
     
     # Add document count
-    doc_count = db.query(Document).filter(Document.collection_id == collection.id).count()
-    setattr(collection, 'document_count', doc_count)
+    collection, document_count = row
+    setattr(collection, 'document_count', document_count)
     
     return collection
 
 
 
+# =============== File Staging ===============
+async def stage_upload(file: UploadFile):
+    """
+    Write an uploaded file to UPLOAD_DIR in chunks off the event loop, hashing as it arrives.
+    Returns (staging path, size, sha256); the caller moves the file into the blob store.
+    """
+    loop = asyncio.get_running_loop()
+    size = 0
+    hasher = hashlib.sha256()
+    staging_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}.part")
+    buffer = await loop.run_in_executor(upload_executor, open, staging_path, "wb")
+    try:
+        while True:
+            data = await file.read(UPLOAD_READ_SIZE)
+            if not data:
+                break
+            size += len(data)
+            if size > MAX_UPLOAD_SIZE:
+                raise HTTPException(status_code=413, detail=f"{file.filename} exceeds the {MAX_UPLOAD_SIZE} byte limit")
+            await loop.run_in_executor(upload_executor, buffer.write, data)
+            hasher.update(data)
+    except BaseException:
+        await loop.run_in_executor(upload_executor, buffer.close)
+        await loop.run_in_executor(upload_executor, os.remove, staging_path)
+        raise
+    await loop.run_in_executor(upload_executor, buffer.close)
+    return staging_path, size, hasher.hexdigest()
+
+def stage_fileobj(fileobj, name):
+    """Blocking counterpart of stage_upload for archive members, run on the upload executor"""
+    size = 0
+    hasher = hashlib.sha256()
+    staging_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}.part")
+    try:
+        with open(staging_path, "wb") as buffer:
+            for data in iter(lambda: fileobj.read(UPLOAD_READ_SIZE), b""):
+                size += len(data)
+                if size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail=f"{name} exceeds the {MAX_UPLOAD_SIZE} byte limit")
+                buffer.write(data)
+                hasher.update(data)
+    except BaseException:
+        os.remove(staging_path)
+        raise
+    return staging_path, size, hasher.hexdigest()
+
+def new_document_row(collection_id, name, size, content_hash, content_type=None):
+    """Values for one collections.documents row; the file lands at its file_path via ingest_file"""
+    document_id = uuid.uuid4()
+    file_extension = os.path.splitext(name)[1]
+    return {
+        "id": str(document_id),
+        "name": name,
+        "type": file_extension.lstrip('.').lower() or "unknown",
+        "size": size,
+        "file_path": os.path.join(DATA_DIR, str(collection_id), f"{document_id}{file_extension}"),
+        "content_type": content_type,
+        "content_hash": content_hash
+    }
+
+def insert_documents(db, collection_id, rows):
+    """Insert many documents with one multi-row statement and return them"""
+    insert_sql = sql_text("""
+        INSERT INTO collections.documents
+        (id, collection_id, name, type, size, file_path, content_type, content_hash)
+        SELECT id, :collection_id, name, type, size, file_path, content_type, content_hash
+        FROM unnest(
+            CAST(:ids AS uuid[]),
+            CAST(:names AS text[]),
+            CAST(:types AS text[]),
+            CAST(:sizes AS bigint[]),
+            CAST(:file_paths AS text[]),
+            CAST(:content_types AS text[]),
+            CAST(:content_hashes AS text[])
+        ) AS t(id, name, type, size, file_path, content_type, content_hash)
+        RETURNING id, collection_id, name, type, size, file_path, content_type, status, created_at, updated_at
+    """)
+    documents = db.execute(insert_sql, {
+        "collection_id": str(collection_id),
+        "ids": [row["id"] for row in rows],
+        "names": [row["name"] for row in rows],
+        "types": [row["type"] for row in rows],
+        "sizes": [row["size"] for row in rows],
+        "file_paths": [row["file_path"] for row in rows],
+        "content_types": [row["content_type"] for row in rows],
+        "content_hashes": [row["content_hash"] for row in rows]
+    }).mappings().all()
+    db.commit()
+    return [dict(document) for document in documents]
+
+def delete_documents(db, document_ids):
+    """Remove rows insert_documents added, when a later step of the upload fails"""
+    db.rollback()
+    db.execute(sql_text("""
+        DELETE FROM collections.documents WHERE id = ANY(CAST(:ids AS uuid[]))
+    """), {"ids": [str(document_id) for document_id in document_ids]})
+    db.commit()
+
+def remove_files(paths):
+    """Remove the files a failed upload left behind; ones already gone are skipped"""
+    for path in paths:
+        if path:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+def queue_documents_task(collection_id, document_ids, user):
+    """Queue one embedding task covering all the given documents, as one work item per document"""
+    task_id = str(uuid.uuid4())
+    queue_document_tasks(task_id, document_ids, collection_id=collection_id, tenant_id=user.id)
+    return task_id
+
+def is_archive_member_skipped(name):
+    """Directories' metadata and OS droppings that are not documents"""
+    parts = name.replace("\\", "/").split("/")
+    return any(part.startswith(".") or part == "__MACOSX" for part in parts) or parts[-1] in ("Thumbs.db", "desktop.ini")
+
+def archive_members(archive_path):
+    """Yield (name, size, open file object) for each regular file in a zip or tar archive"""
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as member:
+                    yield info.filename, info.file_size, member
+    elif tarfile.is_tarfile(archive_path):
+        with tarfile.open(archive_path, mode="r:*") as archive:
+            for info in archive:
+                # Links and devices are never followed
+                if not info.isfile():
+                    continue
+                member = archive.extractfile(info)
+                yield info.name, info.size, member
+    else:
+        raise HTTPException(status_code=400, detail="Archive must be a zip or tar file")
+
+def ingest_archive(archive_path, collection_id):
+    """
+    Stream each archive member into the blob store and link it into the collection's directory.
+    Returns (document rows, skipped member names). Runs on the upload executor.
+    """
+    rows, skipped = [], []
+    expanded = 0
+    staging_path = None
+    try:
+        for name, size, member in archive_members(archive_path):
+            if is_archive_member_skipped(name):
+                skipped.append(name)
+                continue
+            if len(rows) >= MAX_BULK_FILES:
+                raise HTTPException(status_code=413, detail=f"Archive has more than {MAX_BULK_FILES} files")
+            # Declared sizes can lie, so the real size is checked while streaming as well
+            expanded += size
+            if expanded > MAX_ARCHIVE_EXPANDED_SIZE:
+                raise HTTPException(status_code=413, detail=f"Archive expands past {MAX_ARCHIVE_EXPANDED_SIZE} bytes")
+            staging_path, actual_size, content_hash = stage_fileobj(member, name)
+            expanded += actual_size - size
+            row = new_document_row(collection_id, name, actual_size, content_hash)
+            ingest_file(staging_path, content_hash, row["file_path"])
+            staging_path = None
+            rows.append(row)
+    except BaseException:
+        # Nothing is committed yet; drop the links already made and the member being ingested
+        remove_files([row["file_path"] for row in rows] + [staging_path])
+        raise
+    return rows, skipped
+
 # Document endpoints
 @router.post("/collections/{collection_id}/documents", response_model=DocumentResponse)
 async def upload_document(
@@ -113,23 +335,22 @@ async def upload_document(
     os.makedirs(collection_dir, exist_ok=True)
     
     # Generate unique filename
-    file_id = uuid.uuid4()
     file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{file_id}{file_extension}"
-    file_path = os.path.join(collection_dir, unique_filename)
+    file_path = os.path.join(collection_dir, f"{uuid.uuid4()}{file_extension}")
     
-    # Save the file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Save the file off the event loop; file_path becomes a hard link to the shared blob
+    staging_path, size, content_hash = await stage_upload(file)
+    await asyncio.get_running_loop().run_in_executor(upload_executor, ingest_file, staging_path, content_hash, file_path)
     
     # Create document record
     document = Document(
         collection_id=collection_id,
         name=file.filename,
         type=file_extension.lstrip('.').lower() or "unknown",
-        size=os.path.getsize(file_path),
+        size=size,
         file_path=file_path,  # This will now be the container path
-        content_type=file.content_type
+        content_type=file.content_type,
+        content_hash=content_hash
     )
     
     db.add(document)
@@ -138,12 +359,341 @@ async def upload_document(
     
     return document
 
+@router.post("/collections/{collection_id}/documents/bulk", response_model=BulkUploadResponse)
+async def upload_documents_bulk(
+    collection_id: UUID,
+    files: List[UploadFile] = File(...),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_collections_db)
+):
+    """Upload many documents in one multipart request and queue a single embedding task for them"""
+    collection = db.query(Collection).filter(
+        Collection.id == collection_id,
+        Collection.user_id == user.id
+    ).first()
+    
+    if not collection:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    
+    if len(files) > MAX_BULK_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_FILES} files per request")
+    
+    os.makedirs(os.path.join(DATA_DIR, str(collection_id)), exist_ok=True)
+    loop = asyncio.get_running_loop()
+    rows, documents = [], None
+    staging_path = None
+    try:
+        for file in files:
+            staging_path, size, content_hash = await stage_upload(file)
+            row = new_document_row(collection_id, file.filename, size, content_hash, file.content_type)
+            await loop.run_in_executor(upload_executor, ingest_file, staging_path, content_hash, row["file_path"])
+            staging_path = None
+            rows.append(row)
+        documents = insert_documents(db, collection_id, rows)
+        task_id = queue_documents_task(collection_id, [document["id"] for document in documents], user)
+    except BaseException:
+        if documents is not None:
+            delete_documents(db, [document["id"] for document in documents])
+        await loop.run_in_executor(upload_executor, remove_files, [row["file_path"] for row in rows] + [staging_path])
+        raise
+    
+    logger.info(f"Bulk uploaded {len(documents)} documents to collection {collection_id}, queued task {task_id}")
+    return {"documents": documents, "task_id": task_id, "skipped": []}
+
+@router.post("/collections/{collection_id}/documents/archive", response_model=BulkUploadResponse)
+async def upload_documents_archive(
+    collection_id: UUID,
+    file: UploadFile = File(...),
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_collections_db)
+):
+    """Add every file in a zip or tar archive as a document and queue a single embedding task for them"""
+    collection = db.query(Collection).filter(
+        Collection.id == collection_id,
+        Collection.user_id == user.id
+    ).first()
+    
+    if not collection:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    
+    os.makedirs(os.path.join(DATA_DIR, str(collection_id)), exist_ok=True)
+    loop = asyncio.get_running_loop()
+    archive_path, _, _ = await stage_upload(file)
+    try:
+        rows, skipped = await loop.run_in_executor(upload_executor, ingest_archive, archive_path, collection_id)
+    finally:
+        await loop.run_in_executor(upload_executor, os.remove, archive_path)
+    
+    if not rows:
+        raise HTTPException(status_code=400, detail="Archive contains no documents")
+    
+    documents = None
+    try:
+        documents = insert_documents(db, collection_id, rows)
+        task_id = queue_documents_task(collection_id, [document["id"] for document in documents], user)
+    except BaseException:
+        if documents is not None:
+            delete_documents(db, [document["id"] for document in documents])
+        await loop.run_in_executor(upload_executor, remove_files, [row["file_path"] for row in rows])
+        raise
+    
+    logger.info(f"Ingested {len(documents)} documents from {file.filename} into collection {collection_id}, queued task {task_id}")
+    return {"documents": documents, "task_id": task_id, "skipped": skipped}
+
+# =============== Resumable Uploads ===============
+# 1. POST   /collections/{id}/uploads                      -> upload_id
+# 2. PUT    /collections/{id}/uploads/{upload_id}?offset=N  (raw bytes, repeated; resume from GET's offset)
+# 3. POST   /collections/{id}/uploads/{upload_id}/complete  -> document, embedding task queued
+def upload_session_key(upload_id):
+    return f"upload_session:{upload_id}"
+
+def upload_part_path(upload_id):
+    return os.path.join(UPLOAD_DIR, f"{upload_id}.part")
+
+def get_upload_session(collection_id, upload_id, user):
+    """Load an upload session, checking it belongs to the user and collection"""
+    data = redis_client.get(upload_session_key(upload_id))
+    if not data:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    session = json.loads(data)
+    if session["user_id"] != str(user.id) or session["collection_id"] != str(collection_id):
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    return session
+
+def acquire_upload_lock(upload_id):
+    """Hold the upload for one request, or reject with 409 while another request has it"""
+    lock = redis_client.lock(f"upload_lock:{upload_id}", timeout=UPLOAD_LOCK_TIMEOUT, blocking=False)
+    if not lock.acquire():
+        raise HTTPException(status_code=409, detail="Another request is writing to this upload")
+    return lock
+
+def release_upload_lock(lock, upload_id):
+    """Release the upload's lock; it may already have expired under a request slower than UPLOAD_LOCK_TIMEOUT"""
+    try:
+        lock.release()
+    except redis.exceptions.LockNotOwnedError:
+        logger.warning(f"Lock on upload {upload_id} expired before the request finished")
+
+def save_upload_session(session):
+    redis_client.set(upload_session_key(session["upload_id"]), json.dumps(session), ex=UPLOAD_SESSION_TTL)
+
+def hash_file_prefix(path, length):
+    """SHA-256 state over the first length bytes of a file"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = length
+        while remaining > 0:
+            data = f.read(min(UPLOAD_READ_SIZE, remaining))
+            if not data:
+                break
+            hasher.update(data)
+            remaining -= len(data)
+    return hasher
+
+async def get_upload_hasher(upload_id, offset):
+    """Hash of the bytes received so far; recomputed from disk after a restart or on another API process"""
+    cached = upload_hashers.get(upload_id)
+    if cached and cached[1] == offset:
+        return cached[0]
+    loop = asyncio.get_running_loop()
+    hasher = await loop.run_in_executor(upload_executor, hash_file_prefix, upload_part_path(upload_id), offset)
+    upload_hashers[upload_id] = (hasher, offset)
+    return hasher
+
+def open_part_at(path, offset):
+    """Open the partial file for writing at offset, dropping bytes a failed request wrote past it"""
+    f = open(path, "r+b")
+    f.truncate(offset)
+    f.seek(offset)
+    return f
+
+def session_response(session):
+    return {
+        "upload_id": session["upload_id"],
+        "collection_id": session["collection_id"],
+        "filename": session["filename"],
+        "size": session["size"],
+        "offset": session["offset"],
+        "chunk_size": UPLOAD_CHUNK_SIZE
+    }
+
+@router.post("/collections/{collection_id}/uploads", response_model=UploadSessionResponse, status_code=201)
+async def create_upload(
+    collection_id: UUID,
+    upload: UploadSessionCreate,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_collections_db)
+):
+    """Start a resumable upload of one document"""
+    collection = db.query(Collection).filter(
+        Collection.id == collection_id,
+        Collection.user_id == user.id
+    ).first()
+    
+    if not collection:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    
+    if upload.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_SIZE} byte limit")
+    
+    upload_id = str(uuid.uuid4())
+    Path(upload_part_path(upload_id)).touch()
+    session = {
+        "upload_id": upload_id,
+        "user_id": str(user.id),
+        "collection_id": str(collection_id),
+        "filename": upload.filename,
+        "content_type": upload.content_type,
+        "size": upload.size,
+        "offset": 0,
+        "created_at": datetime.utcnow().isoformat()
+    }
+    save_upload_session(session)
+    logger.info(f"Started upload {upload_id} of {upload.filename} ({upload.size} bytes) to collection {collection_id}")
+    return session_response(session)
+
+@router.get("/collections/{collection_id}/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(
+    collection_id: UUID,
+    upload_id: UUID,
+    user: User = Depends(get_current_user)
+):
+    """Current offset of an upload; clients resume by sending the next PUT from here"""
+    return session_response(get_upload_session(collection_id, upload_id, user))
+
+@router.put("/collections/{collection_id}/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def upload_chunk(
+    collection_id: UUID,
+    upload_id: UUID,
+    request: Request,
+    offset: int = Query(..., ge=0),
+    user: User = Depends(get_current_user)
+):
+    """Append the request body at offset, which must equal the bytes already received"""
+    upload_id = str(upload_id)
+    lock = acquire_upload_lock(upload_id)
+    try:
+        session = get_upload_session(collection_id, upload_id, user)
+        if offset != session["offset"]:
+            raise HTTPException(status_code=409, detail=f"Expected offset {session['offset']}")
+        
+        loop = asyncio.get_running_loop()
+        hasher = await get_upload_hasher(upload_id, offset)
+        part = await loop.run_in_executor(upload_executor, open_part_at, upload_part_path(upload_id), offset)
+        try:
+            async for data in request.stream():
+                if not data:
+                    continue
+                if session["offset"] + len(data) > session["size"]:
+                    raise HTTPException(status_code=413, detail="Chunk extends past the declared upload size")
+                await loop.run_in_executor(upload_executor, part.write, data)
+                hasher.update(data)
+                session["offset"] += len(data)
+        finally:
+            # Keep whatever arrived before a disconnect so the client can resume from there
+            await loop.run_in_executor(upload_executor, part.close)
+            upload_hashers[upload_id] = (hasher, session["offset"])
+            save_upload_session(session)
+    finally:
+        release_upload_lock(lock, upload_id)
+    
+    return session_response(session)
+
+@router.post("/collections/{collection_id}/uploads/{upload_id}/complete", response_model=UploadCompleteResponse)
+async def complete_upload(
+    collection_id: UUID,
+    upload_id: UUID,
+    request: UploadComplete = None,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_collections_db)
+):
+    """Turn a fully received upload into a document and queue its embedding"""
+    upload_id = str(upload_id)
+    # The same lock as PUTs, so a retried or concurrent complete can't ingest the part file twice
+    lock = acquire_upload_lock(upload_id)
+    try:
+        session = get_upload_session(collection_id, upload_id, user)
+        if session["offset"] != session["size"]:
+            raise HTTPException(status_code=409, detail=f"Upload incomplete: {session['offset']} of {session['size']} bytes received")
+        
+        sha256 = (await get_upload_hasher(upload_id, session["offset"])).hexdigest()
+        if request and request.sha256 and request.sha256.lower() != sha256:
+            raise HTTPException(status_code=422, detail=f"SHA-256 mismatch: received {sha256}")
+        
+        # Store by content and link it into the collection's directory, named like single-request uploads
+        collection_dir = os.path.join(DATA_DIR, str(collection_id))
+        os.makedirs(collection_dir, exist_ok=True)
+        file_extension = os.path.splitext(session["filename"])[1]
+        file_path = os.path.join(collection_dir, f"{uuid.uuid4()}{file_extension}")
+        await asyncio.get_running_loop().run_in_executor(upload_executor, ingest_file, upload_part_path(upload_id), sha256, file_path)
+        
+        document = Document(
+            collection_id=collection_id,
+            name=session["filename"],
+            type=file_extension.lstrip('.').lower() or "unknown",
+            size=session["size"],
+            file_path=file_path,
+            content_type=session["content_type"],
+            content_hash=sha256
+        )
+        db.add(document)
+        db.commit()
+        db.refresh(document)
+        
+        # Gone before the lock is released, so a retry finds no session rather than a missing part file
+        redis_client.delete(upload_session_key(upload_id))
+        upload_hashers.pop(upload_id, None)
+    finally:
+        release_upload_lock(lock, upload_id)
+    
+    # Queue embedding generation for the new document
+    task_id = queue_documents_task(collection_id, [document.id], user)
+    logger.info(f"Completed upload {upload_id} as document {document.id} (sha256 {sha256}), queued task {task_id}")
+    
+    setattr(document, "sha256", sha256)
+    setattr(document, "task_id", task_id)
+    return document
+
+@router.delete("/collections/{collection_id}/uploads/{upload_id}", status_code=204)
+async def abort_upload(
+    collection_id: UUID,
+    upload_id: UUID,
+    user: User = Depends(get_current_user)
+):
+    """Discard an unfinished upload"""
+    upload_id = str(upload_id)
+    get_upload_session(collection_id, upload_id, user)
+    redis_client.delete(upload_session_key(upload_id))
+    upload_hashers.pop(upload_id, None)
+    try:
+        os.remove(upload_part_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+def encode_cursor(created_at, document_id):
+    """Opaque keyset cursor: the (created_at, id) of the last document on a page"""
+    return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), str(document_id)]).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        created_at, document_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), uuid.UUID(document_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/collections/{collection_id}/documents", response_model=List[DocumentResponse])
 async def get_documents(
     collection_id: UUID, 
+    response: Response,
+    limit: int = Query(DOCUMENTS_PAGE_SIZE, ge=1, le=MAX_DOCUMENTS_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     user: User = Depends(get_current_user),
     db: Session = Depends(get_collections_db)
 ):
+    """
+    One page of a collection's documents, oldest first. When more remain, the
+    X-Next-Cursor response header holds the cursor for the next page.
+    """
     # Verify collection exists and belongs to user
     collection = db.query(Collection).filter(
         Collection.id == collection_id,
@@ -153,6 +703,43 @@ async def get_documents(
     if not collection:
         raise HTTPException(status_code=404, detail="Collection not found")
     
-    documents = db.query(Document).filter(Document.collection_id == collection_id).all()
+    query = db.query(Document).filter(Document.collection_id == collection_id)
+    if cursor:
+        query = query.filter(tuple_(Document.created_at, Document.id) > decode_cursor(cursor))
+    
+    # One extra row tells whether another page exists
+    documents = query.order_by(Document.created_at, Document.id).limit(limit + 1).all()
+    if len(documents) > limit:
+        documents = documents[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(documents[-1].created_at, documents[-1].id)
     return documents
-'''
\ No newline at end of file
+
+@router.delete("/documents/{document_id}")
+async def delete_document(
+    document_id: UUID,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_collections_db)
+):
+    """Delete a document and its chunks; its blob is left to garbage collection"""
+    document = db.query(Document).join(Collection, Document.collection_id == Collection.id).filter(
+        Document.id == document_id,
+        Collection.user_id == user.id
+    ).first()
+    
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    collection_id, file_path = document.collection_id, document.file_path
+    # Chunks go with ON DELETE CASCADE rather than being loaded through the ORM relationship
+    db.query(Document).filter(Document.id == document_id).delete(synchronize_session=False)
+    # Cached retrieval results may quote the deleted chunks
+    version = bump_collection_version(db, collection_id)
+    db.commit()
+    publish_collection_version(collection_id, version)
+    
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+    logger.info(f"Deleted document {document_id} from collection {collection_id}")
+    return {"message": "Document deleted successfully"}
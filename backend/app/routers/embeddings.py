@@ -1,9 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text as sql_text
 from typing import List, Optional, Dict, Any
 import uuid
 import json
+import time
+import asyncio
 from datetime import datetime
 import redis
 import os
@@ -13,15 +16,40 @@ from logger import get_logger
 from common.curr_user import get_current_user
 from data_models import User
 from database import get_collections_db
+from services.vector_search import search_collections, authorize_collections, SEARCH_MODES, RETRIEVAL_MODE
+from services.progress_broker import progress_broker
 
 # Pydantic models
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from uuid import UUID
 
 # Constants
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "512"))
 OVERLAP = int(os.getenv('OVERLAP', '128'))
+EMBEDDING_TASK_TTL = int(os.getenv("EMBEDDING_TASK_TTL", str(7 * 24 * 3600)))  # seconds a task status is kept
+EMBEDDING_TASK_HISTORY = int(os.getenv("EMBEDDING_TASK_HISTORY", "20"))  # task ids indexed per collection
+PROGRESS_KEEPALIVE = int(os.getenv("PROGRESS_KEEPALIVE", "15"))  # seconds between SSE keep-alives
+TERMINAL_TASK_STATUSES = {"completed", "partial", "failed"}
+INTERACTIVE_MAX_DOCUMENTS = int(os.getenv("INTERACTIVE_MAX_DOCUMENTS", "5"))  # larger requests are bulk work
+# Interactive documents a tenant may queue per window; beyond it small requests are bulk work too,
+# so splitting a backfill into small requests doesn't jump the bulk round-robin
+INTERACTIVE_BUDGET_DOCUMENTS = int(os.getenv("INTERACTIVE_BUDGET_DOCUMENTS", "20"))
+INTERACTIVE_BUDGET_WINDOW = int(os.getenv("INTERACTIVE_BUDGET_WINDOW", "60"))  # seconds
+BULK_WAKEUP_MAX = int(os.getenv("BULK_WAKEUP_MAX", "64"))  # pending wake-up tokens, about the most workers run
+QUEUE_WAIT_SAMPLES = 1000  # recent waits kept per priority class for percentiles
+MAX_EF_SEARCH = 1000  # upper bounds for per-query ANN tuning
+MAX_PROBES = 1000
+
+# Queue keys, shared with the embedding worker. Interactive work always goes first; bulk work
+# is queued per tenant and taken round-robin so one user's backfill can't starve the others.
+# Workers BRPOP across these lists, so they need a single Redis rather than a cluster.
+PRIORITY_CLASSES = ("interactive", "bulk")
+INTERACTIVE_QUEUE = "embedding_tasks:interactive"
+BULK_QUEUE_PREFIX = "embedding_tasks:bulk:"
+BULK_TENANTS = "embedding_tasks:bulk_tenants"  # tenants with queued bulk work, rotated by workers
+BULK_WAKEUP = "embedding_tasks:bulk_wakeup"  # one token per bulk item (capped) wakes that many blocked workers
+LEGACY_QUEUE = "embedding_tasks"  # still drained by workers, after the bulk queues
 
 # Redis setup
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -56,7 +84,13 @@ class EmbeddingStatusResponse(BaseModel):
 class SearchQuery(BaseModel):
     query: str
     collection_id: Optional[UUID] = None
+    collection_ids: List[UUID] = []  # search several collections in one query
     limit: int = 10
+    # vector, lexical or hybrid (vector + full-text fused with reciprocal rank fusion)
+    mode: str = RETRIEVAL_MODE
+    # Per-query ANN tuning; defaults are HNSW_EF_SEARCH / IVFFLAT_PROBES. Higher is better recall, slower.
+    ef_search: Optional[int] = Field(None, ge=1, le=MAX_EF_SEARCH)
+    probes: Optional[int] = Field(None, ge=1, le=MAX_PROBES)
     filter_metadata: Optional[Dict[str, Any]] = None
 
 class SearchResult(BaseModel):
@@ -73,9 +107,40 @@ class SearchResult(BaseModel):
         from_attributes = True
 
 # =============== Redis Task Queue Functions ===============
-def queue_embedding_task(task_id, task_type, collection_id=None, document_ids=None):
+def push_task(pipe, task_data, priority, tenant_id=None):
+    """Add a work item to its priority class's queue, stamped for queue-wait accounting"""
+    task_data = dict(task_data, priority=priority, enqueued_at=time.time())
+    if priority == "interactive":
+        pipe.lpush(INTERACTIVE_QUEUE, json.dumps(task_data))
+    else:
+        pipe.lpush(f"{BULK_QUEUE_PREFIX}{tenant_id or 'default'}", json.dumps(task_data))
+
+def announce_bulk_tenant(pipe, tenant_id=None, items=1):
+    """Put the tenant (once) in the round-robin rotation and wake up to items waiting workers"""
+    tenant = str(tenant_id or "default")
+    pipe.lrem(BULK_TENANTS, 0, tenant)
+    pipe.lpush(BULK_TENANTS, tenant)
+    pipe.lpush(BULK_WAKEUP, *[1] * min(items, BULK_WAKEUP_MAX))
+    pipe.ltrim(BULK_WAKEUP, 0, BULK_WAKEUP_MAX - 1)
+
+def choose_priority(document_count, tenant_id=None):
+    """
+    Interactive for small requests while the tenant is within its interactive budget for
+    the current window, bulk otherwise.
+    """
+    if document_count > INTERACTIVE_MAX_DOCUMENTS:
+        return "bulk"
+    window = int(time.time() // INTERACTIVE_BUDGET_WINDOW)
+    key = f"embedding_interactive_budget:{tenant_id or 'default'}:{window}"
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.incrby(key, document_count)
+    pipe.expire(key, INTERACTIVE_BUDGET_WINDOW)
+    used, _ = pipe.execute()
+    return "interactive" if used <= INTERACTIVE_BUDGET_DOCUMENTS else "bulk"
+
+def queue_embedding_task(task_id, task_type, collection_id=None, document_ids=None, priority="bulk", tenant_id=None):
     """Add embedding task to Redis queue"""
-    logger.info(f"Queueing embedding task: task_id={task_id}, type={task_type}, collection_id={collection_id}, document_ids={document_ids}")
+    logger.info(f"Queueing embedding task: task_id={task_id}, type={task_type}, priority={priority}, collection_id={collection_id}, document_ids={document_ids}")
     task_data = {
         "task_id": task_id,
         "task_type": task_type,
@@ -83,11 +148,15 @@ def queue_embedding_task(task_id, task_type, collection_id=None, document_ids=No
         "document_ids": [str(doc_id) for doc_id in document_ids] if document_ids else [],
         "created_at": datetime.utcnow().isoformat()
     }
-    redis_client.lpush("embedding_tasks", json.dumps(task_data))
+    pipe = redis_client.pipeline(transaction=False)
+    push_task(pipe, task_data, priority, tenant_id)
+    if priority != "interactive":
+        announce_bulk_tenant(pipe, tenant_id)
+    pipe.execute()
     logger.info(f"Successfully queued task {task_id} in Redis")
 
-def update_task_status(task_id, status, progress, document_count, processed_count, collection_id=None, document_ids=None):
-    """Update task status in Redis"""
+def update_task_status(task_id, status, progress, document_count, processed_count, collection_id=None, document_ids=None, pipe=None):
+    """Update task status in Redis; with pipe, the writes are only added to that pipeline"""
     task_data = {
         "task_id": task_id,
         "status": status,
@@ -98,8 +167,74 @@ def update_task_status(task_id, status, progress, document_count, processed_coun
         "document_ids": [str(doc_id) for doc_id in document_ids] if document_ids else [],
         "updated_at": datetime.utcnow().isoformat()
     }
-    redis_client.set(f"embedding_task:{task_id}", json.dumps(task_data))
-    logger.debug(f"Successfully updated task {task_id} status in Redis")
+    execute = pipe is None
+    if execute:
+        pipe = redis_client.pipeline()
+    pipe.set(f"embedding_task:{task_id}", json.dumps(task_data), ex=EMBEDDING_TASK_TTL)
+    if collection_id:
+        index_task(pipe, task_id, collection_id)
+    if execute:
+        pipe.execute()
+        logger.debug(f"Successfully updated task {task_id} status in Redis")
+
+def queue_document_tasks(task_id, document_ids, collection_id=None, document_collections=None, tenant_id=None):
+    """
+    Queue one work item per document under a single task, so workers can share a large
+    request. The task's queued status, its progress counters (embedding_task_progress:<id>,
+    incremented by the worker as items finish) and every item go out in one Redis pipeline.
+    Small requests are interactive within the tenant's budget (see choose_priority); the
+    rest is the tenant's bulk work.
+    """
+    document_collections = document_collections or {}
+    priority = choose_priority(len(document_ids), tenant_id)
+    created_at = datetime.utcnow().isoformat()
+    pipe = redis_client.pipeline(transaction=False)
+    update_task_status(
+        task_id, "queued", 0.0, len(document_ids), 0,
+        collection_id=collection_id, document_ids=document_ids, pipe=pipe
+    )
+    progress_key = f"embedding_task_progress:{task_id}"
+    pipe.hset(progress_key, mapping={"document_count": len(document_ids), "done": 0, "processed": 0})
+    pipe.expire(progress_key, EMBEDDING_TASK_TTL)
+    for doc_id in document_ids:
+        item_collection_id = document_collections.get(str(doc_id), collection_id)
+        push_task(pipe, {
+            "task_id": task_id,
+            "task_type": "document",
+            "document_id": str(doc_id),
+            "collection_id": str(item_collection_id) if item_collection_id else None,
+            "created_at": created_at
+        }, priority, tenant_id)
+    if priority != "interactive":
+        announce_bulk_tenant(pipe, tenant_id, items=len(document_ids))
+    pipe.execute()
+    logger.info(f"Queued task {task_id} as {len(document_ids)} {priority} document items")
+
+def collection_tasks_key(collection_id):
+    """Sorted set of a collection's task ids, scored by last update time"""
+    return f"embedding_tasks:collection:{collection_id}"
+
+def index_task(pipe, task_id, collection_id):
+    """Record the task in its collection's index, keeping only the newest EMBEDDING_TASK_HISTORY ids"""
+    key = collection_tasks_key(collection_id)
+    pipe.zadd(key, {task_id: time.time()})
+    pipe.zremrangebyrank(key, 0, -EMBEDDING_TASK_HISTORY - 1)
+    pipe.expire(key, EMBEDDING_TASK_TTL)
+
+def get_latest_collection_task(collection_id):
+    """Most recently updated task of a collection that still has a status, or None"""
+    key = collection_tasks_key(collection_id)
+    task_ids = [task_id.decode() for task_id in redis_client.zrevrange(key, 0, EMBEDDING_TASK_HISTORY - 1)]
+    if not task_ids:
+        return None
+    values = redis_client.mget([f"embedding_task:{task_id}" for task_id in task_ids])
+    expired = [task_id for task_id, data in zip(task_ids, values) if not data]
+    if expired:
+        redis_client.zrem(key, *expired)
+    for data in values:
+        if data:
+            return json.loads(data)
+    return None
 
 def get_task_status(task_id):
     """Get task status from Redis"""
@@ -108,6 +243,35 @@ def get_task_status(task_id):
         return None
     return json.loads(data)
 
+def check_task_access(status_data, user, db):
+    """If the task has a collection_id, verify the user owns that collection"""
+    if not status_data.get("collection_id"):
+        return
+    check_sql = sql_text("""
+        SELECT id 
+        FROM collections.collections 
+        WHERE id = :collection_id AND user_id = :user_id
+    """)
+    
+    collection = db.execute(check_sql, {
+        "collection_id": status_data["collection_id"], 
+        "user_id": str(user.id)
+    }).fetchone()
+    
+    if not collection:
+        raise HTTPException(status_code=403, detail="Not authorized to access this task")
+
+def progress_event(data):
+    """Compact SSE event with the fields that change while a task runs"""
+    payload = {
+        "task_id": data.get("task_id"),
+        "status": data.get("status", "unknown"),
+        "progress": data.get("progress", 0.0),
+        "document_count": data.get("document_count", 0),
+        "processed_count": data.get("processed_count", 0)
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
 # =============== API Endpoints ===============
 @router.post("/generate", response_model=EmbeddingStatusResponse)
 async def generate_embeddings(
@@ -126,22 +290,28 @@ async def generate_embeddings(
         logger.error("Neither document_ids nor collection_id provided")
         raise HTTPException(status_code=400, detail="Either document_ids or collection_id must be provided")
     
-    # Check document permissions if IDs provided
+    # Check document permissions if IDs provided, all in one query
+    document_collections = {}
     if request.document_ids:
-        for doc_id in request.document_ids:
-            check_sql = sql_text("""
-                SELECT d.id 
-                FROM collections.documents d
-                JOIN collections.collections c ON d.collection_id = c.id
-                WHERE d.id = :doc_id AND c.user_id = :user_id
-            """)
-            
-            doc = db.execute(check_sql, {"doc_id": str(doc_id), "user_id": str(user.id)}).fetchone()
-            if not doc:
-                logger.error(f"Document {doc_id} not found or access denied for user {user.id}")
-                raise HTTPException(status_code=404, detail=f"Document {doc_id} not found or access denied")
-            
-            document_ids.append(doc_id)
+        requested_ids = list(dict.fromkeys(str(doc_id) for doc_id in request.document_ids))
+        check_sql = sql_text("""
+            SELECT d.id, d.collection_id
+            FROM collections.documents d
+            JOIN collections.collections c ON d.collection_id = c.id
+            WHERE d.id = ANY(CAST(:doc_ids AS uuid[])) AND c.user_id = :user_id
+        """)
+        
+        rows = db.execute(check_sql, {"doc_ids": requested_ids, "user_id": str(user.id)}).fetchall()
+        document_collections = {str(row.id): str(row.collection_id) for row in rows}
+        rejected_ids = [doc_id for doc_id in requested_ids if doc_id not in document_collections]
+        if rejected_ids:
+            logger.error(f"{len(rejected_ids)} of {len(requested_ids)} documents not found or access denied for user {user.id}")
+            raise HTTPException(status_code=404, detail={
+                "message": "Documents not found or access denied",
+                "rejected_ids": rejected_ids
+            })
+        
+        document_ids = [UUID(doc_id) for doc_id in requested_ids]
     
     # Check collection permissions
     elif request.collection_id:
@@ -167,22 +337,16 @@ async def generate_embeddings(
         document_count = len(document_ids)
         logger.info(f"Processing {document_count} documents")
         
-        # Initialize task status
-        try:
-            update_task_status(
-                task_id, "queued", 0.0, document_count, 0,
-                document_ids=document_ids
-            )
-            logger.info(f"Updated task status in Redis for task {task_id}")
-        except Exception as e:
-            logger.error(f"Failed to update task status in Redis: {str(e)}")
-            raise HTTPException(status_code=500, detail="Failed to initialize task status")
+        # Documents from a single collection make the task visible in that collection's status
+        collection_ids = set(document_collections.values())
+        task_collection_id = collection_ids.pop() if len(collection_ids) == 1 else None
         
-        # Queue task in Redis
+        # Initialize task status and queue one item per document in a single round trip
         try:
-            queue_embedding_task(
-                task_id, "documents", 
-                document_ids=document_ids
+            queue_document_tasks(
+                task_id, document_ids,
+                collection_id=task_collection_id, document_collections=document_collections,
+                tenant_id=user.id
             )
             logger.info(f"Successfully queued task {task_id} for documents")
         except Exception as e:
@@ -191,7 +355,7 @@ async def generate_embeddings(
         
         return {
             "task_id": task_id,
-            "collection_id": None,
+            "collection_id": task_collection_id,
             "document_ids": document_ids,
             "status": "queued", 
             "progress": 0.0,
@@ -225,7 +389,8 @@ async def generate_embeddings(
         try:
             queue_embedding_task(
                 task_id, "collection", 
-                collection_id=collection_id
+                collection_id=collection_id,
+                priority="bulk", tenant_id=user.id
             )
             logger.info(f"Successfully queued task {task_id} for collection")
         except Exception as e:
@@ -253,21 +418,7 @@ async def get_embedding_status(
     if not status_data:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    # If task has a collection_id, verify ownership
-    if status_data.get("collection_id"):
-        check_sql = sql_text("""
-            SELECT id 
-            FROM collections.collections 
-            WHERE id = :collection_id AND user_id = :user_id
-        """)
-        
-        collection = db.execute(check_sql, {
-            "collection_id": status_data["collection_id"], 
-            "user_id": str(user.id)
-        }).fetchone()
-        
-        if not collection:
-            raise HTTPException(status_code=403, detail="Not authorized to access this task")
+    check_task_access(status_data, user, db)
     
     # Convert document_ids back to UUIDs
     document_ids = []
@@ -295,6 +446,53 @@ async def get_embedding_status(
         "processed_count": status_data.get("processed_count", 0)
     }
 
+@router.get("/status/{task_id}/stream")
+async def stream_embedding_status(
+    task_id: str,
+    user: User = Depends(get_current_user),
+    db: Session = Depends(get_collections_db)
+):
+    """Stream progress of an embedding task as server-sent events until it finishes"""
+    status_data = get_task_status(task_id)
+    if not status_data:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    # Ownership is checked once here; the stream itself never touches Postgres
+    check_task_access(status_data, user, db)
+    db.close()
+    
+    async def event_generator():
+        # Subscribe before re-reading the stored status so no delta falls in between
+        queue = await progress_broker.subscribe(task_id)
+        try:
+            current = get_task_status(task_id) or status_data
+            yield progress_event(current)
+            status = current.get("status")
+            
+            while status not in TERMINAL_TASK_STATUSES:
+                try:
+                    delta = await asyncio.wait_for(queue.get(), timeout=PROGRESS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Catch up from the stored status in case a delta was missed while reconnecting
+                    current = get_task_status(task_id)
+                    if current is None:
+                        break
+                    if current.get("status") in TERMINAL_TASK_STATUSES:
+                        yield progress_event(current)
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                yield progress_event(delta)
+                status = delta.get("status")
+        finally:
+            progress_broker.unsubscribe(task_id, queue)
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/document/{document_id}/status")
 async def get_document_embedding_status(
     document_id: UUID,
@@ -337,10 +535,13 @@ async def get_document_embedding_status(
         chunk_sql = sql_text("""
             SELECT COUNT(*) as chunk_count
             FROM collections.document_chunks
-            WHERE document_id = :document_id
+            WHERE collection_id = :collection_id AND document_id = :document_id
         """)
         
-        processed_chunks = db.execute(chunk_sql, {"document_id": str(document_id)}).scalar()
+        processed_chunks = db.execute(chunk_sql, {
+            "collection_id": str(document.collection_id),
+            "document_id": str(document_id)
+        }).scalar()
         
         if processed_chunks > 0:
             status = 'completed'
@@ -372,37 +573,26 @@ async def get_collection_status(
     if not collection:
         raise HTTPException(status_code=404, detail="Collection not found or access denied")
     
-    # Find tasks for this collection from Redis
-    tasks = []
-    for key in redis_client.scan_iter(f"embedding_task:*"):
-        data = redis_client.get(key)
-        if data:
-            task = json.loads(data)
-            if task.get("collection_id") == str(collection_id):
-                tasks.append(task)
-    
-    if not tasks:
-        # Count processed documents by checking chunks
-        doc_sql = sql_text("""
-            SELECT d.id
+    # Latest task for this collection from its Redis index
+    latest_task = get_latest_collection_task(collection_id)
+    
+    if not latest_task:
+        # Count documents and those with chunks in one query
+        count_sql = sql_text("""
+            SELECT
+                COUNT(*) AS document_count,
+                COUNT(*) FILTER (WHERE EXISTS (
+                    SELECT 1
+                    FROM collections.document_chunks dc
+                    WHERE dc.collection_id = d.collection_id AND dc.document_id = d.id
+                )) AS processed_count
             FROM collections.documents d
             WHERE d.collection_id = :collection_id
         """)
         
-        docs = db.execute(doc_sql, {"collection_id": str(collection_id)}).fetchall()
-        document_count = len(docs)
-        
-        processed_count = 0
-        for doc in docs:
-            chunk_sql = sql_text("""
-                SELECT COUNT(*) 
-                FROM collections.document_chunks 
-                WHERE document_id = :doc_id
-            """)
-            
-            chunk_count = db.execute(chunk_sql, {"doc_id": str(doc.id)}).scalar()
-            if chunk_count > 0:
-                processed_count += 1
+        counts = db.execute(count_sql, {"collection_id": str(collection_id)}).fetchone()
+        document_count = counts.document_count
+        processed_count = counts.processed_count
         
         status = "completed" if processed_count == document_count and document_count > 0 else "not_processed"
         progress = processed_count / document_count if document_count > 0 else 0.0
@@ -417,10 +607,6 @@ async def get_collection_status(
             "processed_count": processed_count
         }
     
-    # Sort by updated_at (newest first)
-    tasks.sort(key=lambda t: t.get("updated_at", ""), reverse=True)
-    latest_task = tasks[0]
-    
     # Format response
     document_ids = []
     for doc_id in latest_task.get("document_ids", []):
@@ -437,4 +623,74 @@ async def get_collection_status(
         "progress": latest_task.get("progress", 0.0),
         "document_count": latest_task.get("document_count", 0),
         "processed_count": latest_task.get("processed_count", 0)
-    }
\ No newline at end of file
+    }
+
+@router.get("/queue/stats")
+async def get_queue_stats(user: User = Depends(get_current_user)):
+    """Queue depth and queue-wait time (mean over all tasks, percentiles over recent ones) per priority class"""
+    if not user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    
+    tenants = [tenant.decode() for tenant in redis_client.lrange(BULK_TENANTS, 0, -1)]
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.llen(INTERACTIVE_QUEUE)
+    pipe.llen(LEGACY_QUEUE)
+    for tenant in tenants:
+        pipe.llen(f"{BULK_QUEUE_PREFIX}{tenant}")
+    for priority in PRIORITY_CLASSES:
+        pipe.hgetall(f"embedding_queue:stats:{priority}")
+        pipe.lrange(f"embedding_queue:waits:{priority}", 0, -1)
+    results = pipe.execute()
+    
+    interactive_depth, legacy_depth = results[0], results[1]
+    tenant_depths = dict(zip(tenants, results[2:2 + len(tenants)]))
+    depths = {"interactive": interactive_depth, "bulk": sum(tenant_depths.values()) + legacy_depth}
+    
+    stats = {}
+    wait_results = results[2 + len(tenants):]
+    for i, priority in enumerate(PRIORITY_CLASSES):
+        totals = {key.decode(): float(value) for key, value in wait_results[2 * i].items()}
+        waits = sorted(float(wait) for wait in wait_results[2 * i + 1])
+        count = int(totals.get("count", 0))
+        stats[priority] = {
+            "queued": depths[priority],
+            "dequeued": count,
+            "mean_wait_seconds": totals.get("wait_seconds_total", 0.0) / count if count else 0.0,
+            "p50_wait_seconds": waits[len(waits) // 2] if waits else 0.0,
+            "p95_wait_seconds": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+            "max_recent_wait_seconds": waits[-1] if waits else 0.0
+        }
+    stats["bulk"]["tenants"] = {tenant: depth for tenant, depth in tenant_depths.items() if depth}
+    stats["bulk"]["legacy_queued"] = legacy_depth
+    return stats
+
+@router.post("/search", response_model=List[SearchResult])
+async def search_embeddings(
+    request: SearchQuery,
+    user: User = Depends(get_current_user)
+):
+    """Search the chunks of one or more collections by vector similarity, full text, or both"""
+    if request.mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(SEARCH_MODES)}")
+    
+    collection_ids = [str(collection_id) for collection_id in request.collection_ids]
+    if request.collection_id:
+        collection_ids.insert(0, str(request.collection_id))
+    collection_ids = list(dict.fromkeys(collection_ids))
+    if not collection_ids:
+        raise HTTPException(status_code=400, detail="collection_id or collection_ids must be provided")
+    
+    # Verify ownership of every collection with a single query
+    owned_ids = authorize_collections(collection_ids, user.id)
+    if len(owned_ids) < len(collection_ids):
+        denied = [collection_id for collection_id in collection_ids if collection_id not in owned_ids]
+        raise HTTPException(status_code=404, detail=f"Collections not found or access denied: {', '.join(denied)}")
+    
+    try:
+        results = await search_collections(
+            owned_ids, request.query, request.limit, mode=request.mode,
+            ef_search=request.ef_search, probes=request.probes
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [SearchResult(**row) for row in results]
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from typing import List, Optional
 from pydantic import BaseModel, UUID4
 from sqlalchemy.orm import Session
@@ -7,8 +7,11 @@ from common.curr_user import get_current_user
 from data_models import User
 import uuid
 from logger import get_logger
+from services.project_context import project_context_cache
 from sqlalchemy import text
 import base64
+import json
+from datetime import datetime
 
 # Set up logger
 logger = get_logger("projects")
@@ -16,6 +19,8 @@ logger = get_logger("projects")
 # Create router
 router = APIRouter()
 
+MAX_PROJECTS_PAGE_SIZE = 500
+
 # Pydantic models for request/response
 class DocumentBase(BaseModel):
     name: str
@@ -44,6 +49,50 @@ class ProjectResponse(BaseModel):
     updated_at: str
     documents: List[ProjectDocument] = []
 
+def prepare_document_rows(documents: List[DocumentBase]):
+    """Document rows ready to insert: ids assigned, defaults applied and NUL bytes (rejected by Postgres text) removed"""
+    return [
+        {
+            "doc_id": str(uuid.uuid4()),
+            "name": doc.name,
+            "content": doc.content.replace("\x00", ""),
+            "file_type": doc.file_type or "text/plain"
+        }
+        for doc in documents
+    ]
+
+def insert_project_documents(db, project_id, rows):
+    """Insert many project documents with one multi-row statement; returns them in the order given"""
+    if not rows:
+        return []
+    result = db.execute(text("""
+        INSERT INTO admin.documents (doc_id, project_id, name, content, file_type)
+        SELECT doc_id, :project_id, name, content, file_type
+        FROM unnest(
+            CAST(:doc_ids AS uuid[]),
+            CAST(:names AS text[]),
+            CAST(:contents AS text[]),
+            CAST(:file_types AS text[])
+        ) AS t(doc_id, name, content, file_type)
+        RETURNING doc_id, name, file_type
+    """), {
+        "project_id": str(project_id),
+        "doc_ids": [row["doc_id"] for row in rows],
+        "names": [row["name"] for row in rows],
+        "contents": [row["content"] for row in rows],
+        "file_types": [row["file_type"] for row in rows]
+    }).fetchall()
+    # RETURNING order isn't guaranteed to follow the input
+    inserted = {str(doc.doc_id): doc for doc in result}
+    return [
+        {
+            "doc_id": inserted[row["doc_id"]].doc_id,
+            "name": inserted[row["doc_id"]].name,
+            "file_type": inserted[row["doc_id"]].file_type
+        }
+        for row in rows
+    ]
+
 # Routes for projects
 @router.post("/projects", response_model=ProjectResponse, status_code=status.HTTP_201_CREATED)
 async def create_project(
@@ -53,6 +102,9 @@ async def create_project(
 ):
     """Create a new project with optional documents"""
     try:
+        # Prepare document rows before touching the database so the transaction below stays short
+        document_rows = prepare_document_rows(project.documents or [])
+
         # Generate a new project ID
         project_id = uuid.uuid4()
         
@@ -71,30 +123,8 @@ async def create_project(
         })
         project_data = result.fetchone()
         
-        # Process documents if any
-        document_ids = []
-        if project.documents:
-            for doc in project.documents:
-                doc_id = uuid.uuid4()
-                doc_query = text("""
-                    INSERT INTO admin.documents (doc_id, project_id, name, content, file_type)
-                    VALUES (:doc_id, :project_id, :name, :content, :file_type)
-                    RETURNING doc_id, name, file_type
-                """)
-                
-                doc_result = db.execute(doc_query, {
-                    "doc_id": doc_id,
-                    "project_id": project_id,
-                    "name": doc.name,
-                    "content": doc.content,
-                    "file_type": doc.file_type or "text/plain"
-                })
-                doc_data = doc_result.fetchone()
-                document_ids.append({
-                    "doc_id": doc_data.doc_id,
-                    "name": doc_data.name,
-                    "file_type": doc_data.file_type
-                })
+        # Insert all documents in one statement
+        document_ids = insert_project_documents(db, project_id, document_rows)
         
         db.commit()
         
@@ -116,66 +146,85 @@ async def create_project(
             detail=f"Failed to create project: {str(e)}"
         )
 
+def encode_project_cursor(updated_at, project_id):
+    """Opaque keyset cursor: the (updated_at, project_id) of the last project on a page"""
+    return base64.urlsafe_b64encode(json.dumps([updated_at.isoformat(), str(project_id)]).encode()).decode()
+
+def decode_project_cursor(cursor):
+    try:
+        updated_at, project_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(updated_at), uuid.UUID(project_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
 @router.get("/projects", response_model=List[ProjectResponse])
 async def get_projects(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PROJECTS_PAGE_SIZE, description="Page size; all projects when omitted"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_admin_db)
 ):
-    """Get all projects for the current user"""
+    """
+    Get the current user's projects, most recently updated first, with their documents.
+    With limit, one page is returned and X-Next-Cursor holds the cursor for the next one.
+    """
+    params = {"user_id": current_user.id, "limit": limit + 1 if limit else None}
+    cursor_clause = ""
+    if cursor:
+        params["cursor_updated_at"], params["cursor_project_id"] = decode_project_cursor(cursor)
+        cursor_clause = "AND (updated_at, project_id) < (:cursor_updated_at, :cursor_project_id)"
+    
     try:
-        # Get all projects for the user (basic info only)
-        project_query = text("""
-            SELECT project_id, name, custom_instructions, created_at, updated_at
-            FROM admin.projects
-            WHERE user_id = :user_id
-            ORDER BY updated_at DESC
+        # One page of projects with their documents aggregated in the same query
+        project_query = text(f"""
+            WITH page AS (
+                SELECT project_id, name, custom_instructions, created_at, updated_at
+                FROM admin.projects
+                WHERE user_id = :user_id
+                {cursor_clause}
+                ORDER BY updated_at DESC, project_id DESC
+                LIMIT :limit
+            )
+            SELECT
+                p.project_id, p.name, p.custom_instructions, p.created_at, p.updated_at,
+                COALESCE(
+                    json_agg(json_build_object('doc_id', d.doc_id, 'name', d.name, 'file_type', d.file_type))
+                        FILTER (WHERE d.doc_id IS NOT NULL),
+                    '[]'
+                ) AS documents
+            FROM page p
+            LEFT JOIN admin.documents d ON d.project_id = p.project_id
+            GROUP BY p.project_id, p.name, p.custom_instructions, p.created_at, p.updated_at
+            ORDER BY p.updated_at DESC, p.project_id DESC
         """)
         
-        project_results = db.execute(project_query, {"user_id": current_user.id})
-        projects_base_data = project_results.fetchall()
-        
-        response = []
-        for project_base in projects_base_data:
-            project_id = project_base.project_id
-            project_data = {
-                "project_id": project_base.project_id,
-                "name": project_base.name,
-                "custom_instructions": project_base.custom_instructions,
-                "created_at": project_base.created_at.isoformat(),
-                "updated_at": project_base.updated_at.isoformat(),
-                "documents": []
-            }
-
-            try:
-                # Fetch documents for this project (separate query execution)
-                doc_query = text("""
-                    SELECT doc_id, name, file_type
-                    FROM admin.documents
-                    WHERE project_id = :project_id
-                """)
-                doc_result = db.execute(doc_query, {"project_id": project_id})
-                project_data["documents"] = [
-                    {"doc_id": doc.doc_id, "name": doc.name, "file_type": doc.file_type}
-                    for doc in doc_result.fetchall()
-                ]
-            except Exception as doc_error:
-                # Log error fetching documents for this specific project
-                logger.error(f"Error fetching documents for project {project_id}: {doc_error}")
-                # Continue with empty documents list
-
-            response.append(project_data)
-            
-        return response
+        projects = db.execute(project_query, params).fetchall()
     
     except Exception as e:
-        # This outer exception handles errors during the initial project fetch
-        # or potentially other unexpected issues.
-        db.rollback() # Rollback if the main query fails
+        db.rollback()
         logger.error(f"Error fetching projects list: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch projects list: {str(e)}"
         )
+    
+    # One extra row tells whether another page exists
+    if limit and len(projects) > limit:
+        projects = projects[:limit]
+        response.headers["X-Next-Cursor"] = encode_project_cursor(projects[-1].updated_at, projects[-1].project_id)
+    
+    return [
+        {
+            "project_id": project.project_id,
+            "name": project.name,
+            "custom_instructions": project.custom_instructions,
+            "created_at": project.created_at.isoformat(),
+            "updated_at": project.updated_at.isoformat(),
+            "documents": project.documents
+        }
+        for project in projects
+    ]
 
 @router.get("/projects/{project_id}", response_model=ProjectResponse)
 async def get_project(
@@ -288,6 +337,7 @@ async def update_project(
         
         db.execute(update_query, params)
         db.commit()
+        project_context_cache.invalidate(project_id)
         
         # Return the updated project
         return await get_project(project_id, current_user, db)
@@ -346,6 +396,7 @@ async def delete_project(
         )
         
         db.commit()
+        project_context_cache.invalidate(project_id)
         return None
     
     except HTTPException:
@@ -385,20 +436,13 @@ async def add_document(
             )
         
         # Add document
-        doc_id = uuid.uuid4()
         query = text("""
             INSERT INTO admin.documents (doc_id, project_id, name, content, file_type)
             VALUES (:doc_id, :project_id, :name, :content, :file_type)
             RETURNING doc_id, name, file_type
         """)
         
-        result = db.execute(query, {
-            "doc_id": doc_id,
-            "project_id": project_id,
-            "name": document.name,
-            "content": document.content,
-            "file_type": document.file_type or "text/plain"
-        })
+        result = db.execute(query, {"project_id": project_id, **prepare_document_rows([document])[0]})
         
         doc_data = result.fetchone()
         
@@ -409,6 +453,7 @@ async def add_document(
         )
         
         db.commit()
+        project_context_cache.invalidate(project_id)
         
         return {
             "doc_id": doc_data.doc_id,
@@ -468,6 +513,7 @@ async def delete_document(
         )
         
         db.commit()
+        project_context_cache.invalidate(project_id)
         return None
     
     except HTTPException:
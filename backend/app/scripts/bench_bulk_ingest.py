@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Bulk Ingest Benchmark
+---------------------
+Times adding N small files to a collection through a running API three ways:
+one POST /collections/{id}/documents per file, one multipart POST to
+/documents/bulk, and one zip archive POST to /documents/archive.
+
+Usage:
+    BENCH_ACCESS_TOKEN=<access_token cookie> \\
+        python scripts/bench_bulk_ingest.py --api http://localhost:8000/api --collection <collection_id> --files 1000
+"""
+
+import io
+import os
+import time
+import zipfile
+import argparse
+
+import httpx
+
+
+def make_files(count, size):
+    """Distinct small text files, so none are deduplicated by content"""
+    filler = "lorem ipsum dolor sit amet " * (size // 27 + 1)
+    return [(f"doc_{i:05d}.txt", f"document {i}\n{filler}"[:size].encode("utf-8")) for i in range(count)]
+
+
+def check_created(response, expected):
+    """Fail loudly rather than time a request that didn't add every document"""
+    response.raise_for_status()
+    body = response.json()
+    created = len(body["documents"]) if "documents" in body else 1
+    if created != expected or ("task_id" in body and not body["task_id"]):
+        raise RuntimeError(f"Expected {expected} documents and a queued task, got {created}: {str(body)[:200]}")
+
+
+def bench_single(client, url, files):
+    start = time.perf_counter()
+    for name, content in files:
+        response = client.post(url, files={"file": (name, content, "text/plain")})
+        check_created(response, 1)
+    return time.perf_counter() - start
+
+
+def bench_bulk(client, url, files):
+    start = time.perf_counter()
+    response = client.post(f"{url}/bulk", files=[("files", (name, content, "text/plain")) for name, content in files])
+    check_created(response, len(files))
+    return time.perf_counter() - start
+
+
+def bench_archive(client, url, files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            archive.writestr(f"folder/{name}", content)
+    start = time.perf_counter()
+    response = client.post(f"{url}/archive", files={"file": ("folder.zip", buffer.getvalue(), "application/zip")})
+    check_created(response, len(files))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default="http://localhost:8000/api")
+    parser.add_argument("--collection", required=True)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=2048, help="bytes per file")
+    parser.add_argument("--skip-single", action="store_true")
+    args = parser.parse_args()
+
+    cookies = {"access_token": os.environ["BENCH_ACCESS_TOKEN"]}
+    url = f"{args.api}/collections/{args.collection}/documents"
+    print(f"{args.files} files of {args.size} bytes")
+    print(f"{'method':>10} {'seconds':>9} {'files/s':>9}")
+    with httpx.Client(cookies=cookies, timeout=600) as client:
+        methods = [("bulk", bench_bulk), ("archive", bench_archive)]
+        if not args.skip_single:
+            methods.insert(0, ("single", bench_single))
+        for method, bench in methods:
+            # Fresh content per run so deduplication doesn't flatter later methods
+            files = make_files(args.files, args.size)
+            files = [(name, content + method.encode("utf-8")) for name, content in files]
+            seconds = bench(client, url, files)
+            print(f"{method:>10} {seconds:>9.2f} {args.files / seconds:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
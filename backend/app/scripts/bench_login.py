@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Login Benchmark
+---------------
+Measures, against a running API:
+  1. login throughput: N concurrent POST /login calls, reporting logins/s, latency
+     percentiles and how many were shed with 503;
+  2. streaming time-to-first-token (TTFT) of /generate_stream, alone and while a
+     login burst is in flight, to show how much bcrypt work degrades chat.
+
+Usage:
+    BENCH_EMAIL=<user> BENCH_PASSWORD=<password> BENCH_CHAT_ID=<chat_id> \\
+        python scripts/bench_login.py --api http://localhost:8000 --logins 200 --concurrency 50
+"""
+
+import os
+import time
+import asyncio
+import argparse
+
+import httpx
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def login_once(client, api, email, password):
+    start = time.perf_counter()
+    response = await client.post(f"{api}/login", json={"email": email, "password": password})
+    return response.status_code, time.perf_counter() - start
+
+
+async def login_burst(api, email, password, count, concurrency):
+    """Fire count logins, at most concurrency at a time; returns (seconds, latencies, status counts)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        async def limited():
+            async with semaphore:
+                return await login_once(client, api, email, password)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(limited() for _ in range(count)))
+        seconds = time.perf_counter() - start
+
+    statuses = {}
+    for code, _ in results:
+        statuses[code] = statuses.get(code, 0) + 1
+    latencies = [latency for code, latency in results if code == 200]
+    return seconds, latencies, statuses
+
+
+async def stream_ttft(api, cookies, chat_id, prompt):
+    """Seconds from sending the request to the first streamed byte"""
+    async with httpx.AsyncClient(timeout=300, cookies=cookies) as client:
+        start = time.perf_counter()
+        async with client.stream("POST", f"{api}/generate_stream", json={"chat_id": chat_id, "prompt": prompt}) as response:
+            response.raise_for_status()
+            async for _ in response.aiter_bytes():
+                return time.perf_counter() - start
+    return None
+
+
+async def ttft_samples(api, cookies, chat_id, prompt, streams):
+    return [t for t in await asyncio.gather(*(stream_ttft(api, cookies, chat_id, prompt) for _ in range(streams))) if t is not None]
+
+
+def report_logins(label, seconds, latencies, statuses):
+    ok = statuses.get(200, 0)
+    print(f"{label}: {ok / seconds:.1f} logins/s over {seconds:.2f}s, "
+          f"p50 {percentile(latencies, 0.5) * 1000:.0f} ms, p95 {percentile(latencies, 0.95) * 1000:.0f} ms, "
+          f"status counts {statuses}")
+
+
+def report_ttft(label, samples):
+    print(f"{label}: TTFT p50 {percentile(samples, 0.5) * 1000:.0f} ms, "
+          f"p95 {percentile(samples, 0.95) * 1000:.0f} ms ({len(samples)} streams)")
+
+
+async def run(args):
+    email, password = os.environ["BENCH_EMAIL"], os.environ["BENCH_PASSWORD"]
+
+    seconds, latencies, statuses = await login_burst(args.api, email, password, args.logins, args.concurrency)
+    report_logins("login burst", seconds, latencies, statuses)
+
+    chat_id = os.environ.get("BENCH_CHAT_ID")
+    if not chat_id:
+        print("BENCH_CHAT_ID not set, skipping the streaming TTFT comparison")
+        return
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        response = await client.post(f"{args.api}/login", json={"email": email, "password": password})
+        response.raise_for_status()
+        cookies = {"access_token": response.cookies["access_token"]}
+
+    report_ttft("streams alone", await ttft_samples(args.api, cookies, chat_id, args.prompt, args.streams))
+
+    burst = asyncio.create_task(login_burst(args.api, email, password, args.logins, args.concurrency))
+    # Let the burst saturate the bcrypt pool before the streams start
+    await asyncio.sleep(0.2)
+    report_ttft("streams during login burst", await ttft_samples(args.api, cookies, chat_id, args.prompt, args.streams))
+    report_logins("concurrent login burst", *await burst)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default="http://localhost:8000")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--streams", type=int, default=5, help="concurrent chat streams per TTFT sample")
+    parser.add_argument("--prompt", default="Reply with one word.")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
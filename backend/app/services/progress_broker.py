@@ -0,0 +1,89 @@
+import os
+import json
+import asyncio
+from typing import Dict, Set
+
+import redis.asyncio as aioredis
+
+from logger import get_logger
+
+logger = get_logger("progress_broker")
+
+# =============== Environment Variables ===============
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Must match the channel the embedding worker publishes to
+EMBEDDING_PROGRESS_CHANNEL = os.getenv("EMBEDDING_PROGRESS_CHANNEL", "embedding_progress")
+PROGRESS_QUEUE_SIZE = int(os.getenv("PROGRESS_QUEUE_SIZE", "64"))  # deltas buffered per slow client
+RECONNECT_DELAY = 1  # seconds
+SUBSCRIBE_TIMEOUT = 5  # seconds
+
+class ProgressBroker:
+    """
+    Fans embedding progress deltas out to SSE clients. Each API process holds a single
+    Redis subscription, opened on first use, however many clients are listening;
+    deltas are routed to per-client asyncio queues by task id.
+    """
+
+    def __init__(self, channel: str = EMBEDDING_PROGRESS_CHANNEL):
+        self.channel = channel
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._listener = None
+        self._ready = None
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        """Return a queue receiving the task's deltas; the subscription is live when this returns"""
+        queue = asyncio.Queue(maxsize=PROGRESS_QUEUE_SIZE)
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        if self._listener is None or self._listener.done():
+            self._ready = asyncio.Event()
+            self._listener = asyncio.create_task(self.listen())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=SUBSCRIBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Clients still get the stored status and its periodic refresh
+            logger.warning(f"Progress subscription not ready after {SUBSCRIBE_TIMEOUT}s")
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(task_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[task_id]
+
+    def dispatch(self, data):
+        try:
+            delta = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed progress message: {data!r}")
+            return
+        for queue in self._subscribers.get(delta.get("task_id"), ()):
+            if queue.full():
+                # A client that fell behind only needs the newest state
+                queue.get_nowait()
+            queue.put_nowait(delta)
+
+    async def listen(self):
+        """Read the progress channel for the lifetime of the process, reconnecting on errors"""
+        while True:
+            client = aioredis.from_url(REDIS_URL)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                logger.info(f"Subscribed to {self.channel}")
+                self._ready.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Progress subscription failed: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await pubsub.close()
+                await client.close()
+
+# Shared instance used by the embeddings router
+progress_broker = ProgressBroker()
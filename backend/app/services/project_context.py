@@ -0,0 +1,147 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from logger import get_logger
+
+logger = get_logger("project_context")
+
+# =============== Environment Variables ===============
+PROJECT_CONTEXT_ENABLED = os.getenv("PROJECT_CONTEXT_ENABLED", "true").lower() == "true"
+PROJECT_CONTEXT_MAX_TOKENS = int(os.getenv("PROJECT_CONTEXT_MAX_TOKENS", "1024"))
+PROJECT_CONTEXT_CACHE_SIZE = int(os.getenv("PROJECT_CONTEXT_CACHE_SIZE", "256"))  # projects kept in memory
+
+@dataclass
+class ProjectContext:
+    """
+    A project's prompt prefix, built for one version (updated_at) of the project. Only the
+    text is cached; TGI tokenizes the prompt itself, so token_count is an estimate for logging.
+    """
+    project_id: str
+    version: str
+    text: str
+    token_count: int
+
+def estimate_tokens(value: str) -> int:
+    """Four characters per token, the same estimate the document budget uses"""
+    return max(1, len(value) // 4)
+
+def fit_documents(documents, token_budget: int) -> List[str]:
+    """
+    Format the project's documents within the token budget. Each document gets an equal share
+    of what is left, so one long file can't crowd out the rest; unused share carries over.
+    """
+    parts = []
+    remaining = token_budget
+    for i, doc in enumerate(documents):
+        if remaining <= 0:
+            break
+        share = remaining // (len(documents) - i)
+        content = doc.content or ""
+        if estimate_tokens(content) > share:
+            content = content[:share * 4].rstrip() + "\n[...truncated]"
+        part = f"--- Start of File: {doc.name} ---\n{content}\n--- End of File: {doc.name} ---"
+        parts.append(part)
+        remaining -= estimate_tokens(part)
+    return parts
+
+def build_project_context(db, project_id: str, version: str) -> Optional[ProjectContext]:
+    """Assemble the prefix from the project's instructions and documents"""
+    project = db.execute(
+        text("SELECT custom_instructions FROM admin.projects WHERE project_id = :project_id"),
+        {"project_id": project_id}
+    ).fetchone()
+    if project is None:
+        return None
+    documents = db.execute(
+        text("SELECT name, content FROM admin.documents WHERE project_id = :project_id ORDER BY name, doc_id"),
+        {"project_id": project_id}
+    ).fetchall()
+
+    sections = []
+    instructions = (project.custom_instructions or "").strip()
+    if instructions:
+        sections.append(f"\n\nProject Instructions:\n{instructions}")
+    if documents:
+        budget = PROJECT_CONTEXT_MAX_TOKENS - estimate_tokens(instructions) if instructions else PROJECT_CONTEXT_MAX_TOKENS
+        doc_parts = fit_documents(documents, budget)
+        if doc_parts:
+            sections.append("\n\nProject Documents:\n" + "\n\n".join(doc_parts))
+    prefix = "".join(sections)
+    if not prefix:
+        return None
+
+    return ProjectContext(
+        project_id=project_id,
+        version=version,
+        text=prefix,
+        token_count=estimate_tokens(prefix)
+    )
+
+class ProjectContextCache:
+    """
+    Project prefixes keyed by (project_id, updated_at). Every project and project-document
+    change bumps updated_at, so a stale prefix is never served even by another API process;
+    invalidate() additionally drops it here right away.
+    """
+
+    def __init__(self, max_entries: int = PROJECT_CONTEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, ProjectContext]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_for_chat(self, db, chat_id: str) -> Optional[ProjectContext]:
+        """The prefix of the project the chat belongs to, or None for chats outside a project"""
+        if not PROJECT_CONTEXT_ENABLED:
+            return None
+        row = db.execute(text("""
+            SELECT p.project_id, p.updated_at
+            FROM admin.project_chats pc
+            JOIN admin.projects p ON p.project_id = pc.project_id
+            WHERE pc.chat_id = :chat_id
+            LIMIT 1
+        """), {"chat_id": chat_id}).fetchone()
+        if row is None:
+            return None
+
+        project_id, version = str(row.project_id), row.updated_at.isoformat()
+        with self._lock:
+            context = self._entries.get(project_id)
+            if context is not None and context.version == version:
+                self._entries.move_to_end(project_id)
+                self.hits += 1
+                return context
+
+        self.misses += 1
+        context = build_project_context(db, project_id, version)
+        if context is None:
+            return None
+        logger.info(f"Built prompt prefix for project {project_id} ({context.token_count} tokens)")
+        with self._lock:
+            self._entries[project_id] = context
+            self._entries.move_to_end(project_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return context
+
+    def invalidate(self, project_id):
+        with self._lock:
+            self._entries.pop(str(project_id), None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+        }
+
+# Shared instance used by the chat and projects routers
+project_context_cache = ProjectContextCache()
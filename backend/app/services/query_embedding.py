@@ -0,0 +1,185 @@
+import os
+import asyncio
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+from logger import get_logger
+
+logger = get_logger("query_embedding")
+
+# =============== Environment Variables ===============
+# Model configuration matches the embedding worker so queries and chunks share one vector space
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "intfloat/multilingual-e5-large-instruct")
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "1024"))
+EMBEDDING_MAX_LENGTH = int(os.getenv("CHUNK_SIZE", "512"))
+HF_HOME = os.getenv("HF_HOME")
+USE_CPU = os.getenv("USE_CPU", "false").lower() in ("true", "yes", "1", "on")
+EMBEDDING_CPU_THREADS = int(os.getenv("EMBEDDING_CPU_THREADS", "0"))
+EMBEDDING_CPU_QUANTIZE = os.getenv("EMBEDDING_CPU_QUANTIZE", "true").lower() == "true"
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+QUERY_EMBEDDING_MAX_BATCH = int(os.getenv("QUERY_EMBEDDING_MAX_BATCH", "32"))
+QUERY_EMBEDDING_BATCH_WAIT_MS = float(os.getenv("QUERY_EMBEDDING_BATCH_WAIT_MS", "5"))
+
+# =============== Model Loading ===============
+def get_device() -> str:
+    return "cuda" if torch.cuda.is_available() and not USE_CPU else "cpu"
+
+@lru_cache(maxsize=1)
+def get_embedding_model():
+    """Load and cache the embedding model"""
+    logger.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME}")
+    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME, cache_dir=HF_HOME)
+    model = AutoModel.from_pretrained(EMBEDDING_MODEL_NAME, cache_dir=HF_HOME)
+    model.eval()
+    if get_device() == "cuda":
+        model = model.to("cuda")
+        logger.info("Using GPU for embeddings")
+    else:
+        # Dynamic int8 quantization of the Linear layers makes CPU inference practical
+        if EMBEDDING_CPU_THREADS > 0:
+            torch.set_num_threads(EMBEDDING_CPU_THREADS)
+        if EMBEDDING_CPU_QUANTIZE:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        logger.info(f"Using CPU for embeddings (int8 quantized: {EMBEDDING_CPU_QUANTIZE})")
+    return tokenizer, model
+
+def embed_batch(texts: List[str]) -> np.ndarray:
+    """Run the model on a batch of texts with attention-mask aware mean pooling"""
+    tokenizer, model = get_embedding_model()
+    device = get_device()
+
+    inputs = tokenizer(texts, padding=True, truncation=True, return_tensors="pt", max_length=EMBEDDING_MAX_LENGTH)
+    inputs = {k: v.to(device) for k, v in inputs.items()}
+
+    with torch.inference_mode():
+        outputs = model(**inputs)
+        mask = inputs["attention_mask"].unsqueeze(-1).to(outputs.last_hidden_state.dtype)
+        pooled = (outputs.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+    embeddings = pooled.float().cpu().numpy()
+
+    # Pad or truncate to the stored dimension, the same way the worker does for chunks
+    current_dims = embeddings.shape[1]
+    if current_dims < EMBEDDING_DIMENSION:
+        embeddings = np.pad(embeddings, ((0, 0), (0, EMBEDDING_DIMENSION - current_dims)))
+    elif current_dims > EMBEDDING_DIMENSION:
+        embeddings = embeddings[:, :EMBEDDING_DIMENSION]
+    return embeddings
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace so trivially different spellings of a query share a cache entry"""
+    return " ".join(text.split())
+
+# =============== Query Embedding Service ===============
+class QueryEmbeddingService:
+    """
+    Embeds user queries for retrieval.
+
+    Results are kept in a bounded LRU cache keyed on (model id, normalized query).
+    Concurrent cache misses are collected for up to QUERY_EMBEDDING_BATCH_WAIT_MS
+    (or until QUERY_EMBEDDING_MAX_BATCH queries are waiting) and embedded in a single
+    forward pass. Identical queries already in flight share one result.
+    """
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        cache_size: int = QUERY_EMBEDDING_CACHE_SIZE,
+        max_batch: int = QUERY_EMBEDDING_MAX_BATCH,
+        batch_wait_ms: float = QUERY_EMBEDDING_BATCH_WAIT_MS,
+    ):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000.0
+        self._cache: "OrderedDict[tuple, List[float]]" = OrderedDict()
+        self._inflight = {}
+        self._queue = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+    async def embed(self, text: str) -> List[float]:
+        """Return the embedding for a query, from cache when possible"""
+        if not text or not text.strip():
+            logger.warning("Empty text provided for embedding generation")
+            return []
+
+        key = (self.model_name, normalize_query(text))
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._inflight[key] = future
+            self._queue.append(key)
+            if len(self._queue) >= self.max_batch:
+                self._schedule_flush(loop, immediate=True)
+            elif self._flush_handle is None:
+                self._schedule_flush(loop)
+        return await asyncio.shield(future)
+
+    def _schedule_flush(self, loop, immediate: bool = False):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        delay = 0 if immediate else self.batch_wait
+        self._flush_handle = loop.call_later(delay, lambda: asyncio.ensure_future(self._flush()))
+
+    async def _flush(self):
+        self._flush_handle = None
+        batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+        if self._queue:
+            self._schedule_flush(asyncio.get_running_loop(), immediate=True)
+        if not batch:
+            return
+
+        self.batches += 1
+        logger.debug(f"Embedding batch of {len(batch)} queries")
+        try:
+            embeddings = await asyncio.to_thread(embed_batch, [query for _, query in batch])
+        except Exception as e:
+            logger.error(f"Error embedding query batch: {e}")
+            for key in batch:
+                future = self._inflight.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, embedding in zip(batch, embeddings):
+            result = embedding.tolist()
+            self._store(key, result)
+            future = self._inflight.pop(key, None)
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    def _store(self, key, embedding: List[float]):
+        self._cache[key] = embedding
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "cache_entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+            "batches": self.batches,
+        }
+
+# Shared instance used by retrieval
+query_embedding_service = QueryEmbeddingService()
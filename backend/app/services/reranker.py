@@ -0,0 +1,178 @@
+import os
+import re
+import time
+import hashlib
+import asyncio
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from logger import get_logger
+from services.query_embedding import normalize_query
+
+logger = get_logger("reranker")
+
+# =============== Environment Variables ===============
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() == "true"
+RERANKER_MODEL_NAME = os.getenv("RERANKER_MODEL_NAME", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))  # chunks fetched by ANN before re-ranking
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "512"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1.0 = relevance only, lower = more diversity
+MMR_DUPLICATE_THRESHOLD = float(os.getenv("MMR_DUPLICATE_THRESHOLD", "0.9"))  # word overlap treated as a duplicate
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1024"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "1024"))
+RERANK_RETRY_AFTER = int(os.getenv("RERANK_RETRY_AFTER", "300"))  # seconds to keep retrieval order after a failure
+HF_HOME = os.getenv("HF_HOME")
+USE_CPU = os.getenv("USE_CPU", "false").lower() in ("true", "yes", "1", "on")
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# =============== Model Loading ===============
+def get_device() -> str:
+    return "cuda" if torch.cuda.is_available() and not USE_CPU else "cpu"
+
+@lru_cache(maxsize=1)
+def get_reranker_model():
+    """Load and cache the cross-encoder"""
+    logger.info(f"Loading reranker model: {RERANKER_MODEL_NAME}")
+    tokenizer = AutoTokenizer.from_pretrained(RERANKER_MODEL_NAME, cache_dir=HF_HOME)
+    model = AutoModelForSequenceClassification.from_pretrained(RERANKER_MODEL_NAME, cache_dir=HF_HOME)
+    model.eval()
+    model = model.to(get_device())
+    return tokenizer, model
+
+def score_pairs(query: str, texts: List[str]) -> np.ndarray:
+    """Cross-encoder relevance of each text to the query, in [0, 1]"""
+    tokenizer, model = get_reranker_model()
+    device = get_device()
+    scores = []
+    for start in range(0, len(texts), RERANK_BATCH_SIZE):
+        batch = texts[start:start + RERANK_BATCH_SIZE]
+        inputs = tokenizer([query] * len(batch), batch, padding=True, truncation=True,
+                           return_tensors="pt", max_length=RERANK_MAX_LENGTH)
+        inputs = {k: v.to(device) for k, v in inputs.items()}
+        with torch.inference_mode():
+            logits = model(**inputs).logits
+        # Single-logit models score relevance directly; two-logit models use the "relevant" class
+        logits = logits[:, -1] if logits.shape[-1] > 1 else logits[:, 0]
+        scores.append(torch.sigmoid(logits).float().cpu().numpy())
+    return np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+def word_set(text: str) -> frozenset:
+    return frozenset(WORD_PATTERN.findall(text.lower()))
+
+def overlap(a: frozenset, b: frozenset) -> float:
+    """Jaccard similarity of two word sets; overlapping neighbour chunks score high"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def select_mmr(candidates: List[dict], relevance: np.ndarray, limit: int, token_budget: int) -> List[int]:
+    """
+    Pick up to limit candidates by maximal marginal relevance, skipping near-duplicates
+    and anything that no longer fits the token budget. Returns candidate positions.
+    """
+    words = [word_set(row["chunk_text"]) for row in candidates]
+    tokens = [estimate_tokens(row["chunk_text"]) for row in candidates]
+    remaining = list(range(len(candidates)))
+    selected = []
+    budget = token_budget
+
+    while remaining and len(selected) < limit:
+        best, best_score = None, None
+        for i in list(remaining):
+            redundancy = max((overlap(words[i], words[j]) for j in selected), default=0.0)
+            if redundancy >= MMR_DUPLICATE_THRESHOLD or (selected and tokens[i] > budget):
+                remaining.remove(i)
+                continue
+            score = MMR_LAMBDA * relevance[i] - (1 - MMR_LAMBDA) * redundancy
+            if best_score is None or score > best_score:
+                best, best_score = i, score
+        if best is None:
+            break
+        # The most relevant chunk is always kept, even if it alone exceeds the budget
+        selected.append(best)
+        remaining.remove(best)
+        budget -= tokens[best]
+    return selected
+
+# =============== Reranker ===============
+class Reranker:
+    """
+    Re-scores retrieved chunks with a cross-encoder, then keeps the best k by MMR
+    within a token budget. Results are cached per (query, candidate set): the
+    candidate chunk ids change whenever the collection's relevant content does.
+    If the cross-encoder can't be loaded or fails, the retrieval order is kept.
+    """
+
+    def __init__(self, cache_size: int = RERANK_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, List[tuple]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self._retry_at = 0.0
+
+    def cache_key(self, query: str, candidates: List[dict]) -> tuple:
+        query_hash = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+        candidate_hash = hashlib.sha256(
+            ",".join(sorted(str(row["chunk_id"]) for row in candidates)).encode("utf-8")
+        ).hexdigest()
+        return (RERANKER_MODEL_NAME, query_hash, candidate_hash)
+
+    async def rerank(self, query: str, candidates: List[dict], limit: int,
+                     token_budget: int = CONTEXT_TOKEN_BUDGET) -> List[dict]:
+        """Return the best limit candidates, most useful first"""
+        if not candidates:
+            return []
+
+        by_id = {str(row["chunk_id"]): row for row in candidates}
+        key = self.cache_key(query, candidates) + (limit, token_budget)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return [dict(by_id[chunk_id], rerank_score=score) for chunk_id, score in cached]
+
+        self.misses += 1
+        if time.monotonic() < self._retry_at:
+            return candidates[:limit]
+        try:
+            relevance = await asyncio.to_thread(score_pairs, query, [row["chunk_text"] for row in candidates])
+        except Exception as e:
+            # A missing model (e.g. offline without HF_HOME populated) must not cost the chat its context
+            self.failures += 1
+            self._retry_at = time.monotonic() + RERANK_RETRY_AFTER
+            logger.error(f"Re-ranking failed, keeping retrieval order for {RERANK_RETRY_AFTER}s: {e}")
+            return candidates[:limit]
+        selected = select_mmr(candidates, relevance, limit, token_budget)
+        results = [dict(candidates[i], rerank_score=float(relevance[i])) for i in selected]
+        logger.debug(f"Re-ranked {len(candidates)} candidates down to {len(results)}")
+
+        self._cache[key] = [(str(row["chunk_id"]), row["rerank_score"]) for row in results]
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return results
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": RERANKER_MODEL_NAME,
+            "cache_entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+        }
+
+# Shared instance used by retrieval
+reranker = Reranker()
@@ -0,0 +1,170 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+import redis
+from sqlalchemy import text
+
+from logger import get_logger
+
+logger = get_logger("retrieval_cache")
+
+# =============== Environment Variables ===============
+RETRIEVAL_CACHE_ENABLED = os.getenv("RETRIEVAL_CACHE_ENABLED", "true").lower() == "true"
+RETRIEVAL_CACHE_BACKEND = os.getenv("RETRIEVAL_CACHE_BACKEND", "memory").lower()  # 'memory' or 'redis'
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "4096"))  # entries, in-process backend
+RETRIEVAL_CACHE_TTL = int(os.getenv("RETRIEVAL_CACHE_TTL", "86400"))  # seconds, Redis backend
+COLLECTION_VERSION_TTL = int(os.getenv("COLLECTION_VERSION_TTL", "86400"))  # seconds; bounds how long a missed update lingers
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Collection versions only move forward, so a late write-back can't roll one back; shared with the embedding worker
+SET_VERSION_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current and tonumber(current) >= tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+redis_client = redis.from_url(REDIS_URL)
+set_version = redis_client.register_script(SET_VERSION_SCRIPT)
+
+def version_key(collection_id: str) -> str:
+    """Redis key the embedding worker updates when a collection's content changes"""
+    return f"collection_version:{collection_id}"
+
+def get_collection_versions(collection_ids: List[str]) -> Dict[str, int]:
+    """
+    Current version of each collection, from Redis in one round trip.
+    Versions missing from Redis (e.g. after a Redis restart) are read from Postgres once and written back.
+    """
+    versions = {}
+    try:
+        values = redis_client.mget([version_key(collection_id) for collection_id in collection_ids])
+        versions = {
+            collection_id: int(value)
+            for collection_id, value in zip(collection_ids, values) if value is not None
+        }
+    except redis.RedisError as e:
+        logger.warning(f"Could not read collection versions from Redis: {e}")
+
+    missing = [collection_id for collection_id in collection_ids if collection_id not in versions]
+    if missing:
+        from database import get_collections_db
+        db = next(get_collections_db())
+        try:
+            rows = db.execute(
+                text("SELECT id, version FROM collections.collections WHERE id = ANY(CAST(:collection_ids AS uuid[]))"),
+                {"collection_ids": missing}
+            ).fetchall()
+        finally:
+            db.close()
+        for row in rows:
+            versions[str(row.id)] = row.version
+            try:
+                set_version(keys=[version_key(str(row.id))], args=[row.version, COLLECTION_VERSION_TTL])
+            except redis.RedisError:
+                pass
+    return versions
+
+def bump_collection_version(db, collection_id: str) -> Optional[int]:
+    """Bump a collection's version in the caller's transaction; publish it once that commits"""
+    return db.execute(
+        text("UPDATE collections.collections SET version = version + 1 WHERE id = :collection_id RETURNING version"),
+        {"collection_id": str(collection_id)}
+    ).scalar()
+
+def publish_collection_version(collection_id: str, version: Optional[int]):
+    """
+    Mirror a committed version to Redis. If that fails the key is dropped, so readers fall
+    back to Postgres instead of trusting the old version and serving stale results.
+    """
+    if version is None:
+        return
+    key = version_key(str(collection_id))
+    try:
+        set_version(keys=[key], args=[version, COLLECTION_VERSION_TTL])
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish version of collection {collection_id}, dropping it: {e}")
+        try:
+            redis_client.delete(key)
+        except redis.RedisError as e:
+            logger.error(f"Could not drop version of collection {collection_id} (stale for up to {COLLECTION_VERSION_TTL}s): {e}")
+
+def query_hash(query_embedding: Optional[np.ndarray], query_text: str) -> str:
+    """Hash of the query embedding; lexical-only queries have none and hash the text instead"""
+    if query_embedding is not None:
+        return hashlib.sha256(np.asarray(query_embedding, dtype=np.float32).tobytes()).hexdigest()
+    return hashlib.sha256(" ".join(query_text.split()).encode("utf-8")).hexdigest()
+
+def result_key(versions: Dict[str, int], query_digest: str, limit: int, mode: str) -> str:
+    """Cache key over (collection_id, version) of every searched collection, the query, k and mode"""
+    collections_part = ",".join(f"{collection_id}:{versions.get(collection_id, 0)}" for collection_id in sorted(versions))
+    return "retrieval:" + hashlib.sha256(f"{collections_part}|{query_digest}|{limit}|{mode}".encode("utf-8")).hexdigest()
+
+class RetrievalCache:
+    """
+    Formatted retrieval context keyed by collection versions and query.
+    Entries never need explicit invalidation: a changed collection has a new version,
+    so its old entries simply stop being looked up and age out of the LRU / TTL.
+    """
+
+    def __init__(self, backend: str = RETRIEVAL_CACHE_BACKEND, max_entries: int = RETRIEVAL_CACHE_SIZE,
+                 ttl: int = RETRIEVAL_CACHE_TTL):
+        self.backend = backend
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        if self.backend == "redis":
+            try:
+                value = redis_client.get(key)
+            except redis.RedisError as e:
+                logger.warning(f"Retrieval cache read failed: {e}")
+                value = None
+            value = value.decode("utf-8") if value is not None else None
+        else:
+            with self._lock:
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, context: str):
+        if self.backend == "redis":
+            try:
+                redis_client.setex(key, self.ttl, context)
+            except redis.RedisError as e:
+                logger.warning(f"Retrieval cache write failed: {e}")
+            return
+        with self._lock:
+            self._entries[key] = context
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self._entries) if self.backend != "redis" else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0.0,
+        }
+
+# Shared instance used by retrieval
+retrieval_cache = RetrievalCache()
@@ -1,25 +1,36 @@
-'''
 import os
+import heapq
 import asyncio
+import itertools
 import numpy as np
-import torch
+from typing import List
 from sqlalchemy import text
 from sqlalchemy.orm import Session
-from functools import lru_cache
 import traceback
-from transformers import AutoModelForCausalLM, AutoTokenizer, TextIteratorStreamer, AutoModel
 
 # Change to absolute imports
 from database import get_collections_db
 from logger import get_logger
+from services.query_embedding import query_embedding_service
+from services.vector_store import get_vector_store
+from services.reranker import reranker, RERANK_ENABLED, RERANK_CANDIDATES
+from services.retrieval_cache import (
+    retrieval_cache, get_collection_versions, query_hash, result_key, RETRIEVAL_CACHE_ENABLED
+)
 
 logger = get_logger("vector_search")
 
 # =============== Environment Variables ===============
-EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "intfloat/multilingual-e5-base")
-EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1"))
-EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "768"))
 VECTORDB_K = int(os.getenv("VECTORDB_K", "2"))
+# Retrieval mode: vector, lexical or hybrid (both fused with reciprocal rank fusion)
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+# What the score of a retrieved chunk means in each mode, as shown to the model
+SCORE_LABELS = {"vector": "Similarity", "lexical": "Text rank", "hybrid": "Fusion score"}
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")  # lexical/hybrid are opt-in
+SEARCH_TEXT_CONFIG = os.getenv("SEARCH_TEXT_CONFIG", "simple")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+MAX_COLLECTIONS_PER_QUERY = int(os.getenv("MAX_COLLECTIONS_PER_QUERY", "20"))
 
 # =============== Initialization Functions ===============
 async def initialize_vector_search():
@@ -45,56 +56,10 @@ async def initialize_vector_search():
         # but log the error for investigation
 
 # =============== Embedding Functions ===============
-@lru_cache(maxsize=EMBEDDING_CACHE_SIZE)
-def get_embedding_model():
-    """Load and cache the embedding model"""
-    logger.info(f"Loading embedding model: {EMBEDDING_MODEL_NAME}")
-    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME)
-    model = AutoModel.from_pretrained(EMBEDDING_MODEL_NAME)
-    if torch.cuda.is_available():
-        model = model.to("cuda")
-        logger.info("Using GPU for embeddings")
-    else:
-        logger.info("Using CPU for embeddings")
-    return tokenizer, model
-
 async def generate_embedding(text):
-    """Generate embedding for text using the loaded model"""
+    """Generate embedding for text via the shared, cached query-embedding service"""
     logger.debug(f"Generating embedding for text of length: {len(text)}")
-
-    if not text or not text.strip():
-        logger.warning("Empty text provided for embedding generation")
-        return []
-
-    # If CUDA is not available, return random embedding for testing
-    if not torch.cuda.is_available():
-        logger.debug("GPU not available, generating random embedding for simulation")
-        # Generate random embedding with the same dimension as the model
-        random_embedding = np.random.normal(0, 0.1, EMBEDDING_DIMENSION).astype(np.float32)
-        # Simulate processing time
-        await asyncio.sleep(0.5)
-        return random_embedding.tolist()
-
-    # If CUDA is available, use the actual model
-    tokenizer, model = get_embedding_model()
-
-    # Tokenize and prepare for model
-    inputs = tokenizer(text, padding=True, truncation=True, return_tensors="pt", max_length=512)
-
-    # Move to GPU
-    inputs = {k: v.to("cuda") for k, v in inputs.items()}
-
-    # Generate embeddings
-    with torch.no_grad():
-        outputs = model(**inputs)
-        # Use mean pooling to get a single vector
-        embeddings = outputs.last_hidden_state.mean(dim=1).squeeze().cpu().numpy()
-
-        # Handle case where outputs is single dimension
-        if len(embeddings.shape) == 1:
-            return embeddings.tolist()
-        else:
-            return embeddings[0].tolist()
+    return await query_embedding_service.embed(text)
 
 async def ensure_pgvector_extension(db: Session):
     """Ensure pgvector extension is created and available"""
@@ -124,120 +89,239 @@ async def ensure_pgvector_extension(db: Session):
         logger.error(traceback.format_exc())
         return False
 
-async def retrieve_collection_context(collection_id: str, query_text: str, limit: int = VECTORDB_K):
+def search_chunks_by_vector(collection_id: str, query_embedding: np.ndarray, limit: int,
+                            ef_search: int = None, probes: int = None):
+    """Top-k chunks of a collection by cosine similarity, from the configured vector store"""
+    return get_vector_store().search(collection_id, query_embedding, limit, ef_search=ef_search, probes=probes)
+
+def search_chunks_by_text(collection_id: str, query_text: str, limit: int):
+    """
+    Top-k chunks of a collection by full-text match on search_tsv.
+    Query terms are OR-ed so a single exact identifier is enough to match; ts_rank_cd
+    with length normalisation ranks chunks matching more (and closer) terms first.
     """
-    Retrieve relevant chunks from a collection based on similarity to the query
+    db_generator = get_collections_db()
+    db = next(db_generator)
+    try:
+        search_sql = text("""
+            WITH q AS (
+                SELECT replace(plainto_tsquery(CAST(:config AS regconfig), :query)::text, '&', '|')::tsquery AS query
+            )
+            SELECT
+                dc.id as chunk_id,
+                dc.chunk_text,
+                dc.chunk_index,
+                d.name as document_name,
+                d.id as document_id,
+                c.name as collection_name,
+                c.id as collection_id,
+                ts_rank_cd(dc.search_tsv, q.query, 1) as similarity
+            FROM
+                q,
+                collections.document_chunks dc
+            JOIN
+                collections.documents d ON dc.document_id = d.id
+            JOIN
+                collections.collections c ON dc.collection_id = c.id
+            WHERE
+                dc.collection_id = :collection_id
+                AND dc.search_tsv @@ q.query
+            ORDER BY
+                similarity DESC
+            LIMIT :limit
+        """)
+        return db.execute(
+            search_sql,
+            {"config": SEARCH_TEXT_CONFIG, "query": query_text, "collection_id": str(collection_id), "limit": limit}
+        ).mappings().all()
+    finally:
+        db.close()
+
+def reciprocal_rank_fusion(result_lists, limit: int, k: int = RRF_K):
+    """
+    Merge ranked result lists with reciprocal rank fusion: score = sum of 1 / (k + rank).
+    Only ranks are used, so cosine similarities and text ranks need no calibration.
+    """
+    scores = {}
+    rows = {}
+    for results in result_lists:
+        for rank, row in enumerate(results, start=1):
+            chunk_id = row["chunk_id"]
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+            rows.setdefault(chunk_id, row)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+    return [dict(rows[chunk_id], similarity=scores[chunk_id]) for chunk_id in ranked]
+
+async def embed_query(query_text: str, mode: str):
+    """Validate the mode and embed the query once; lexical search needs no embedding"""
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+    if mode == "lexical":
+        return None
+
+    logger.debug(f"Generating embedding for query: {query_text[:100]}...")
+    query_embedding = await generate_embedding(query_text)
+    if not query_embedding:
+        raise ValueError("Failed to generate query embedding")
+    return np.asarray(query_embedding, dtype=np.float32)
+
+async def search_with_embedding(collection_id: str, query_text: str, query_embedding: np.ndarray, limit: int,
+                                mode: str, ef_search: int = None, probes: int = None):
+    """
+    Search one collection with an already computed query embedding.
+    In hybrid mode the vector and lexical top-k run concurrently and are fused with RRF;
+    each side fetches HYBRID_CANDIDATES rows so fusion has more than the final k to work with.
     """
+    if mode == "lexical":
+        return await asyncio.to_thread(search_chunks_by_text, collection_id, query_text, limit)
+
+    if mode == "vector":
+        return await asyncio.to_thread(search_chunks_by_vector, collection_id, query_embedding, limit, ef_search, probes)
+
+    candidates = max(limit, HYBRID_CANDIDATES)
+    vector_results, text_results = await asyncio.gather(
+        asyncio.to_thread(search_chunks_by_vector, collection_id, query_embedding, candidates, ef_search, probes),
+        asyncio.to_thread(search_chunks_by_text, collection_id, query_text, candidates),
+    )
+    return reciprocal_rank_fusion([vector_results, text_results], limit)
+
+async def search_collection(collection_id: str, query_text: str, limit: int = VECTORDB_K,
+                            mode: str = RETRIEVAL_MODE, ef_search: int = None, probes: int = None):
+    """Search a collection in one of SEARCH_MODES"""
+    query_embedding = await embed_query(query_text, mode)
+    return await search_with_embedding(collection_id, query_text, query_embedding, limit, mode, ef_search, probes)
+
+async def search_collections(collection_ids: List[str], query_text: str, limit: int = VECTORDB_K,
+                             mode: str = RETRIEVAL_MODE, ef_search: int = None, probes: int = None,
+                             query_embedding: np.ndarray = None):
+    """
+    Search several collections with one query.
+    The query is embedded once, each collection's partition is searched concurrently
+    (so latency tracks the slowest single-collection search, not the sum) and the
+    per-collection top-k lists are merged with a heap. Scores of the same mode are
+    comparable across collections: cosine similarity, text rank, or RRF score.
+    Callers must have checked ownership, e.g. with authorize_collections, and may pass
+    a query_embedding they already computed.
+    """
+    collection_ids = list(dict.fromkeys(str(collection_id) for collection_id in collection_ids))
+    if not collection_ids:
+        return []
+    if len(collection_ids) > MAX_COLLECTIONS_PER_QUERY:
+        raise ValueError(f"At most {MAX_COLLECTIONS_PER_QUERY} collections can be searched at once")
+
+    if query_embedding is None:
+        query_embedding = await embed_query(query_text, mode)
+    if len(collection_ids) == 1:
+        return await search_with_embedding(collection_ids[0], query_text, query_embedding, limit, mode, ef_search, probes)
+
+    per_collection = await asyncio.gather(*[
+        search_with_embedding(collection_id, query_text, query_embedding, limit, mode, ef_search, probes)
+        for collection_id in collection_ids
+    ])
+    return heapq.nlargest(limit, itertools.chain.from_iterable(per_collection), key=lambda row: row["similarity"])
+
+def authorize_collections(collection_ids: List[str], user_id: str) -> List[str]:
+    """Return the subset of collection_ids owned by the user, checked in a single query"""
+    if not collection_ids:
+        return []
+    db_generator = get_collections_db()
+    db = next(db_generator)
     try:
-        # Generate embedding for the query text
-        logger.debug(f"Generating embedding for query: {query_text[:100]}...")
-        query_embedding = await generate_embedding(query_text)
+        owned_sql = text("""
+            SELECT id
+            FROM collections.collections
+            WHERE id = ANY(CAST(:collection_ids AS uuid[]))
+            AND user_id = :user_id
+        """)
+        owned = {
+            str(row.id) for row in db.execute(owned_sql, {
+                "collection_ids": [str(collection_id) for collection_id in collection_ids],
+                "user_id": str(user_id)
+            }).fetchall()
+        }
+    finally:
+        db.close()
+    return [str(collection_id) for collection_id in collection_ids if str(collection_id) in owned]
+
+def format_context(result, include_collection: bool = False, mode: str = "vector") -> str:
+    """Format retrieved chunks as prompt context, labelling scores by how they were computed"""
+    chunks_text = []
+    for row in result:
+        chunk_text = row["chunk_text"]
+        doc_name = row["document_name"]
+        # Cross-encoder relevance when the chunks were re-ranked, retrieval score otherwise
+        if "rerank_score" in row:
+            label, similarity = "Relevance", row["rerank_score"]
+        else:
+            label, similarity = SCORE_LABELS.get(mode, "Score"), row["similarity"]
 
-        if not query_embedding:
-            logger.error("Failed to generate query embedding")
-            return ""
+        # Add formatted chunk with document name and score
+        logger.debug(f"Chunk from '{doc_name}' with score: {similarity:.4f}")
+        source = f"Collection: {row['collection_name']}\n" if include_collection else ""
+        chunks_text.append(f"{source}Document: {doc_name}\n{label}: {similarity:.4f}\nText: {chunk_text}\n")
 
-        # Log embedding dimension for debugging
-        embedding_dimension = len(query_embedding)
-        logger.debug(f"Generated embedding with dimension: {embedding_dimension}")
+    # Combine all chunks
+    return "Context:\n" + "\n".join(chunks_text)
 
-        # Get database connection - Consuming the generator properly
-        db_generator = get_collections_db()
-        db = next(db_generator)
+async def retrieve_collection_context(collection_id: str, query_text: str, limit: int = VECTORDB_K,
+                                      mode: str = RETRIEVAL_MODE, ef_search: int = None, probes: int = None):
+    """
+    Retrieve relevant chunks from a collection for the query.
+    mode is one of SEARCH_MODES; ef_search/probes override HNSW_EF_SEARCH/IVFFLAT_PROBES for this query.
+    """
+    return await retrieve_collections_context([collection_id], query_text, limit, mode, ef_search, probes)
 
+async def retrieve_collections_context(collection_ids: List[str], query_text: str, limit: int = VECTORDB_K,
+                                       mode: str = RETRIEVAL_MODE, ef_search: int = None, probes: int = None):
+    """
+    Retrieve the most relevant chunks across one or more collections for the query.
+    The formatted context is cached per (collection versions, query embedding, k, mode),
+    so a repeated question against unchanged collections is answered without Postgres.
+    """
+    collection_ids = list(dict.fromkeys(str(collection_id) for collection_id in collection_ids))
+    label = ", ".join(collection_ids)
+    try:
+        logger.debug(f"Querying for chunks in collections {label} similar to prompt ({mode})")
         try:
-            # Convert embedding to text for SQL
-            embedding_str = str(query_embedding)
-            # Query for similar chunks
-            logger.debug(f"Querying for chunks in collection {collection_id} similar to prompt")
-
-            # Check if embeddings exist for this collection
-            check_sql = text("""
-                SELECT COUNT(*)
-                FROM collections.document_chunks dc
-                JOIN collections.documents d ON dc.document_id = d.id
-                WHERE d.collection_id = :collection_id
-                AND dc.embedding IS NOT NULL
-            """)
-
-            embedding_count = db.execute(check_sql, {"collection_id": str(collection_id)}).scalar()
-            logger.debug(f"Found {embedding_count} document chunks with embeddings in collection {collection_id}")
-
-            if embedding_count == 0:
-                logger.warning(f"No document chunks with embeddings found in collection {collection_id}")
-                return f"Note: Collection {collection_id} has no embedded document chunks yet."
-
-            # SQL for vector similarity search
-            search_sql = text("""
-                SET search_path TO collections, public;
-
-                SELECT
-                    dc.chunk_text,
-                    dc.chunk_index,
-                    d.name as document_name,
-                    d.id as document_id,
-                    c.name as collection_name,
-                    c.id as collection_id,
-                    1 - (dc.embedding <=> (:embedding)::vector) as similarity
-                FROM
-                    collections.document_chunks dc
-                JOIN
-                    collections.documents d ON dc.document_id = d.id
-                JOIN
-                    collections.collections c ON d.collection_id = c.id
-                WHERE
-                    c.id = :collection_id
-                    AND dc.embedding IS NOT NULL
-                ORDER BY
-                    dc.embedding <=> (:embedding)::vector
-                LIMIT :limit
-            """)
-
-            # Execute similarity search query
-            result = db.execute(
-                search_sql,
-                {
-                    "embedding": embedding_str,
-                    "collection_id": str(collection_id),
-                    "limit": limit
-                }
-            ).fetchall()
-
-            # If no results, return empty string
-            if not result:
-                logger.warning(f"No similar chunks found for collection {collection_id}")
-                return ""
-
-            # Format results
-            logger.debug(f"Found {len(result)} similar chunks in collection {collection_id}")
-
-            chunks_text = []
-            for row in result:
-                chunk_text = row.chunk_text
-                doc_name = row.document_name
-                similarity = row.similarity
-
-                # Add formatted chunk with document name and similarity score
-                logger.debug(f"Chunk from '{doc_name}' with similarity score: {similarity:.4f}")
-                chunks_text.append(f"Document: {doc_name}\nSimilarity: {similarity:.4f}\nText: {chunk_text}\n")
-
-            # Combine all chunks
-            context = "Context:\n" + "\n".join(chunks_text)
-
-            return context
-
+            query_embedding = await embed_query(query_text, mode)
+
+            cache_key = None
+            if RETRIEVAL_CACHE_ENABLED:
+                versions = await asyncio.to_thread(get_collection_versions, collection_ids)
+                cache_key = result_key(versions, query_hash(query_embedding, query_text), limit, mode)
+                cached = await asyncio.to_thread(retrieval_cache.get, cache_key)
+                if cached is not None:
+                    logger.debug(f"Retrieval cache hit for collections {label}")
+                    return cached
+
+            # Retrieve many, then let the cross-encoder pick the most useful k within the token budget
+            candidates = max(limit, RERANK_CANDIDATES) if RERANK_ENABLED else limit
+            result = await search_collections(
+                collection_ids, query_text, candidates, mode=mode, ef_search=ef_search, probes=probes,
+                query_embedding=query_embedding
+            )
+            if RERANK_ENABLED:
+                result = await reranker.rerank(query_text, result, limit)
         except Exception as e:
             if "different column dimensions" in str(e).lower():
-                logger.error(f"Vector dimension mismatch. Query vector dimension: {len(query_embedding)}")
+                logger.error("Vector dimension mismatch between query and stored embeddings")
                 return "Error: Vector dimension mismatch between query and stored embeddings."
-            logger.error(f"Error during vector similarity search: {str(e)}")
+            logger.error(f"Error during similarity search: {str(e)}")
             return "Error: Unable to perform similarity search."
 
-        finally:
-            # Properly close the database connection
-            db.close()
+        # Vector (and so hybrid) search returns rows whenever chunks are embedded; text search only on a term match
+        if not result:
+            logger.warning(f"No matching document chunks found in collections {label} ({mode})")
+            if mode != "lexical":
+                return f"Note: Collection {label} has no embedded document chunks yet."
+            return f"Note: No document chunks in collection {label} match the query."
+
+        logger.debug(f"Found {len(result)} similar chunks in collections {label}")
+        context = format_context(result, include_collection=len(collection_ids) > 1, mode=mode)
+        if cache_key:
+            await asyncio.to_thread(retrieval_cache.put, cache_key, context)
+        return context
 
     except Exception as e:
         logger.error(f"Error retrieving collection context: {str(e)}")
-        return "Error: Unable to retrieve context from collection." 
-'''
\ No newline at end of file
+        return "Error: Unable to retrieve context from collection."
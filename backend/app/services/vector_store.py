@@ -0,0 +1,294 @@
+import os
+import json
+import time
+import threading
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import text
+
+from logger import get_logger
+
+try:
+    import hnswlib
+except ImportError:  # Optional: without it the local store always searches exactly
+    hnswlib = None
+
+logger = get_logger("vector_store")
+
+# =============== Environment Variables ===============
+# pgvector: search inside Postgres. local: memory-mapped per-collection matrices written by the embedding worker
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pgvector").lower()
+DATA_DIR = os.getenv("DATA_DIR", os.path.expanduser("~/data"))
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", os.path.join(DATA_DIR, "vector_store"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "40"))
+IVFFLAT_PROBES = int(os.getenv("IVFFLAT_PROBES", "10"))
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "1024"))
+QUANTIZED_CANDIDATES = int(os.getenv("QUANTIZED_CANDIDATES", "100"))  # rows re-ranked at full precision
+EMBEDDING_STORAGE_CACHE_TTL = float(os.getenv("EMBEDDING_STORAGE_CACHE_TTL", "60"))
+
+# Column and join list shared by both backends so results look the same
+CHUNK_COLUMNS = """
+    dc.id as chunk_id,
+    dc.chunk_text,
+    dc.chunk_index,
+    d.name as document_name,
+    d.id as document_id,
+    c.name as collection_name,
+    c.id as collection_id
+"""
+CHUNK_JOINS = """
+    collections.document_chunks dc
+JOIN
+    collections.documents d ON dc.document_id = d.id
+JOIN
+    collections.collections c ON dc.collection_id = c.id
+"""
+
+# Candidate query per reduced-precision embedding_storage: (indexed expression, operator, query expression).
+# The expressions must match the per-collection index the embedding worker builds.
+QUANTIZED_SEARCH = {
+    "halfvec": (
+        f"dc.embedding::halfvec({EMBEDDING_DIMENSION})",
+        "<=>",
+        f"CAST(:embedding AS vector)::halfvec({EMBEDDING_DIMENSION})",
+    ),
+    "bit": (
+        f"binary_quantize(dc.embedding)::bit({EMBEDDING_DIMENSION})",
+        "<~>",
+        f"binary_quantize(CAST(:embedding AS vector))::bit({EMBEDDING_DIMENSION})",
+    ),
+}
+
+def open_collections_db():
+    # Imported lazily so the local backend's file handling can be used without a collections database
+    from database import get_collections_db
+    return next(get_collections_db())
+
+# =============== Vector Store Interface ===============
+class VectorStore:
+    """Nearest-neighbour search over a collection's chunk embeddings"""
+
+    name = "base"
+
+    def search(self, collection_id: str, query: np.ndarray, limit: int,
+               ef_search: int = None, probes: int = None) -> List[dict]:
+        """
+        Return up to limit chunk rows (CHUNK_COLUMNS plus similarity), most similar first.
+        ef_search/probes tune approximate backends and are ignored where they don't apply.
+        """
+        raise NotImplementedError
+
+# =============== pgvector Backend ===============
+class PgVectorStore(VectorStore):
+    """
+    Searches the collection's chunks with its partial pgvector ANN index; collections too
+    small to have one are scanned exactly through the (collection_id, id) primary key.
+    Collections whose embedding_storage is halfvec or bit have a reduced-precision index:
+    it yields QUANTIZED_CANDIDATES rows, which are re-ranked by full-precision cosine.
+    """
+
+    name = "pgvector"
+
+    def __init__(self):
+        self._storage = {}
+
+    def collection_storage(self, db, collection_id: str) -> str:
+        """The collection's embedding_storage, cached for EMBEDDING_STORAGE_CACHE_TTL seconds"""
+        cached = self._storage.get(collection_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        storage = db.execute(
+            text("SELECT embedding_storage FROM collections.collections WHERE id = :collection_id"),
+            {"collection_id": collection_id}
+        ).scalar() or "vector"
+        self._storage[collection_id] = (storage, time.monotonic() + EMBEDDING_STORAGE_CACHE_TTL)
+        return storage
+
+    def search(self, collection_id, query, limit, ef_search=None, probes=None):
+        collection_id = str(collection_id)
+        db = open_collections_db()
+        try:
+            storage = self.collection_storage(db, collection_id)
+            quantized = QUANTIZED_SEARCH.get(storage)
+            candidates = max(QUANTIZED_CANDIDATES, limit) if quantized else limit
+
+            # hnsw.ef_search must be at least the LIMIT, otherwise HNSW returns fewer rows
+            db.execute(
+                text("SELECT set_config('hnsw.ef_search', :ef_search, true), set_config('ivfflat.probes', :probes, true)"),
+                {"ef_search": str(max(ef_search or HNSW_EF_SEARCH, candidates)), "probes": str(probes or IVFFLAT_PROBES)}
+            )
+            if quantized:
+                column_expr, operator, query_expr = quantized
+                search_sql = text(f"""
+                    WITH candidates AS MATERIALIZED (
+                        SELECT dc.id
+                        FROM collections.document_chunks dc
+                        WHERE dc.collection_id = :collection_id
+                        AND dc.embedding IS NOT NULL
+                        ORDER BY {column_expr} {operator} {query_expr}
+                        LIMIT :candidates
+                    )
+                    SELECT
+                        {CHUNK_COLUMNS},
+                        1 - (dc.embedding <=> (:embedding)::vector) as similarity
+                    FROM
+                        {CHUNK_JOINS}
+                    JOIN
+                        candidates ON candidates.id = dc.id
+                    WHERE
+                        dc.collection_id = :collection_id
+                    ORDER BY
+                        dc.embedding <=> (:embedding)::vector
+                    LIMIT :limit
+                """)
+            else:
+                search_sql = text(f"""
+                    SELECT
+                        {CHUNK_COLUMNS},
+                        1 - (dc.embedding <=> (:embedding)::vector) as similarity
+                    FROM
+                        {CHUNK_JOINS}
+                    WHERE
+                        dc.collection_id = :collection_id
+                        AND dc.embedding IS NOT NULL
+                    ORDER BY
+                        dc.embedding <=> (:embedding)::vector
+                    LIMIT :limit
+                """)
+            return db.execute(search_sql, {
+                "embedding": np.asarray(query, dtype=np.float32),
+                "collection_id": collection_id,
+                "candidates": candidates,
+                "limit": limit
+            }).mappings().all()
+        finally:
+            db.close()
+
+# =============== Local Memory-Mapped Backend ===============
+class LocalCollectionIndex:
+    """
+    One collection's vectors as exported by the embedding worker:
+    <dir>/<collection_id>/manifest.json names the current embeddings-<version>.npy
+    (unit-normalised float32 rows), chunk_ids-<version>.npy (the chunk id of each
+    row) and, for large collections, an hnsw-<version>.bin graph. The manifest is
+    replaced atomically, so a reader always sees a matching set of files.
+    """
+
+    def __init__(self, directory: str, manifest: dict):
+        self.version = manifest["version"]
+        self.matrix = np.load(os.path.join(directory, manifest["embeddings"]), mmap_mode="r")
+        self.chunk_ids = np.load(os.path.join(directory, manifest["chunk_ids"]), mmap_mode="r")
+        self.graph = None
+        if manifest.get("hnsw") and hnswlib is not None:
+            self.graph = hnswlib.Index(space="ip", dim=self.matrix.shape[1])
+            self.graph.load_index(os.path.join(directory, manifest["hnsw"]), max_elements=len(self.chunk_ids))
+
+    def chunk_id(self, row: int) -> str:
+        return self.chunk_ids[row].decode()
+
+    def top_k(self, query: np.ndarray, limit: int, ef_search: int = None):
+        """Return [(row, cosine similarity)] of the best limit rows"""
+        limit = min(limit, len(self.chunk_ids))
+        if limit == 0:
+            return []
+        if self.graph is not None:
+            self.graph.set_ef(max(ef_search or HNSW_EF_SEARCH, limit))
+            labels, distances = self.graph.knn_query(query, k=limit)
+            return [(int(row), 1.0 - float(distance)) for row, distance in zip(labels[0], distances[0])]
+
+        scores = self.matrix @ query
+        if limit < len(scores):
+            best = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        return [(int(row), float(scores[row])) for row in best]
+
+class LocalVectorStore(VectorStore):
+    """
+    Exact NumPy top-k over memory-mapped per-collection matrices, or an HNSW graph
+    when the worker built one. Only the winning chunk ids go to Postgres to fetch
+    text and names, so no vector crosses the wire on the query path.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str = VECTOR_STORE_DIR):
+        self.directory = directory
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def collection_dir(self, collection_id: str) -> str:
+        return os.path.join(self.directory, str(collection_id))
+
+    def load(self, collection_id: str) -> Optional[LocalCollectionIndex]:
+        """Return the collection's index, reloading it when the worker has exported a new version"""
+        directory = self.collection_dir(collection_id)
+        # The worker keeps superseded files for a while; a second attempt covers a reader
+        # that read a manifest just before it, and its files, were replaced
+        for attempt in range(2):
+            try:
+                with open(os.path.join(directory, "manifest.json")) as f:
+                    manifest = json.load(f)
+            except FileNotFoundError:
+                return None
+
+            with self._lock:
+                index = self._indexes.get(collection_id)
+                if index is not None and index.version == manifest["version"]:
+                    return index
+                logger.info(f"Loading local vector index for collection {collection_id} (version {manifest['version']})")
+                try:
+                    index = LocalCollectionIndex(directory, manifest)
+                except FileNotFoundError:
+                    if attempt:
+                        raise
+                    continue
+                self._indexes[collection_id] = index
+                return index
+
+    def search(self, collection_id, query, limit, ef_search=None, probes=None):
+        collection_id = str(collection_id)
+        index = self.load(collection_id)
+        if index is None:
+            logger.warning(f"No local vector index for collection {collection_id}")
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        hits = index.top_k(query, limit, ef_search=ef_search)
+        if not hits:
+            return []
+
+        db = open_collections_db()
+        try:
+            rows_sql = text(f"""
+                SELECT {CHUNK_COLUMNS}
+                FROM {CHUNK_JOINS}
+                WHERE dc.collection_id = :collection_id
+                AND dc.id = ANY(CAST(:chunk_ids AS uuid[]))
+            """)
+            rows = db.execute(rows_sql, {
+                "collection_id": collection_id,
+                "chunk_ids": [index.chunk_id(row) for row, _ in hits]
+            }).mappings().all()
+        finally:
+            db.close()
+
+        # Chunks deleted since the last export simply drop out
+        by_id = {str(row["chunk_id"]): row for row in rows}
+        return [
+            dict(by_id[index.chunk_id(row)], similarity=similarity)
+            for row, similarity in hits
+            if index.chunk_id(row) in by_id
+        ]
+
+@lru_cache(maxsize=1)
+def get_vector_store() -> VectorStore:
+    """The configured vector store backend"""
+    if VECTOR_STORE_BACKEND == "local":
+        logger.info(f"Using local vector store at {VECTOR_STORE_DIR} (hnswlib available: {hnswlib is not None})")
+        return LocalVectorStore()
+    return PgVectorStore()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The app imports its modules flat (from database import ...), as main.py is run from backend/app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.py creates its engines at import; no connection is opened until a session is used
+os.environ.setdefault("ADMIN_DATABASE_URL", "sqlite://")
+os.environ.setdefault("CHAT_DATABASE_URL", "sqlite://")
@@ -0,0 +1,85 @@
+import os
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+
+import utils.blob_store as blob_store
+from utils.blob_store import blob_path, collect_garbage, ingest_file
+
+
+class FakeDB:
+    """Answers the referenced_hashes query"""
+
+    def __init__(self, hashes):
+        self.hashes = hashes
+
+    def execute(self, statement, params=None):
+        return SimpleNamespace(fetchall=lambda: [SimpleNamespace(content_hash=h) for h in self.hashes])
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    return tmp_path
+
+
+def staged(directory, name, content):
+    path = directory / name
+    path.write_bytes(content)
+    return str(path), hashlib.sha256(content).hexdigest()
+
+
+def test_identical_uploads_share_one_blob(store):
+    first, sha = staged(store, "1.part", b"same bytes")
+    second, _ = staged(store, "2.part", b"same bytes")
+    doc_a, doc_b = str(store / "c1" / "a.txt"), str(store / "c2" / "b.txt")
+
+    assert ingest_file(first, sha, doc_a) is False
+    assert ingest_file(second, sha, doc_b) is True
+
+    # Staging files are consumed; both documents are hard links to the one blob
+    assert not os.path.exists(first) and not os.path.exists(second)
+    assert os.stat(blob_path(sha)).st_nlink == 3
+    assert os.path.samefile(doc_a, blob_path(sha)) and os.path.samefile(doc_b, blob_path(sha))
+    assert sum(len(files) for _, _, files in os.walk(blob_store.BLOB_DIR)) == 1
+
+
+def test_gc_keeps_referenced_and_recent_blobs(store):
+    referenced, referenced_sha = staged(store, "r.part", b"referenced")
+    recent, recent_sha = staged(store, "n.part", b"recent")
+    old, old_sha = staged(store, "o.part", b"unreferenced")
+    for path, sha in ((referenced, referenced_sha), (recent, recent_sha), (old, old_sha)):
+        blob_store.store_blob(path, sha)
+    for sha in (referenced_sha, old_sha):
+        os.utime(blob_path(sha), (0, 0))
+
+    stats = collect_garbage(FakeDB({referenced_sha}), grace_seconds=3600)
+
+    assert stats == {"removed": 1, "kept": 2, "freed_bytes": len(b"unreferenced")}
+    assert os.path.exists(blob_path(referenced_sha)) and os.path.exists(blob_path(recent_sha))
+    assert not os.path.exists(blob_path(old_sha))
+
+
+def test_gc_never_breaks_a_linked_document(store):
+    source, sha = staged(store, "1.part", b"still linked")
+    document = str(store / "c1" / "a.txt")
+    ingest_file(source, sha, document)
+    os.utime(blob_path(sha), (0, 0))
+
+    # The document row is gone but its file still links to the blob: no space is freed by
+    # removing the blob, and the document file keeps its content
+    stats = collect_garbage(FakeDB(set()), grace_seconds=0)
+
+    assert stats["removed"] == 1 and stats["freed_bytes"] == 0
+    with open(document, "rb") as f:
+        assert f.read() == b"still linked"
+
+
+def test_gc_dry_run_removes_nothing(store):
+    source, sha = staged(store, "1.part", b"orphan")
+    blob_store.store_blob(source, sha)
+    os.utime(blob_path(sha), (0, 0))
+
+    assert collect_garbage(FakeDB(set()), grace_seconds=0, dry_run=True)["removed"] == 1
+    assert os.path.exists(blob_path(sha))
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+import routers.chat as chat
+import services.vector_search as vector_search
+from routers.chat import ChatRequest, get_collection_context
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeDB:
+    """Answers the chat-owner lookup"""
+
+    def __init__(self, owner):
+        self.owner = owner
+
+    def execute(self, statement, params=None):
+        return FakeResult(self.owner)
+
+
+@pytest.fixture
+def retrieval(monkeypatch):
+    """Stub the collections database and the search behind the functions chat.py imports"""
+    calls = {}
+
+    def authorize(collection_ids, user_id):
+        calls["authorize"] = (list(collection_ids), user_id)
+        return [collection_id for collection_id in collection_ids if collection_id != "not-owned"]
+
+    async def retrieve(collection_ids, query_text, *args, **kwargs):
+        calls["retrieve"] = (list(collection_ids), query_text)
+        return "Context:\nDocument: a.txt"
+
+    # raising=True (the default) fails the test if chat.py no longer has these names
+    monkeypatch.setattr(chat, "authorize_collections", authorize)
+    monkeypatch.setattr(chat, "retrieve_collections_context", retrieve)
+    return calls
+
+
+def test_chat_uses_live_retrieval_functions():
+    assert chat.authorize_collections is vector_search.authorize_collections
+    assert chat.retrieve_collections_context is vector_search.retrieve_collections_context
+
+
+def test_collection_context_for_owned_collections(retrieval):
+    request = ChatRequest(
+        chat_id="chat-1", prompt="What is in a.txt?",
+        collection={"id": "c1"}, collections=[{"id": "c2"}, {"id": "not-owned"}]
+    )
+    context = asyncio.run(get_collection_context(FakeDB("user-1"), request))
+
+    assert context == "Context:\nDocument: a.txt"
+    assert retrieval["authorize"] == (["c1", "c2", "not-owned"], "user-1")
+    assert retrieval["retrieve"] == (["c1", "c2"], "What is in a.txt?")
+
+
+def test_no_collection_context_without_collections(retrieval):
+    request = ChatRequest(chat_id="chat-1", prompt="Hi")
+    assert asyncio.run(get_collection_context(FakeDB("user-1"), request)) is None
+    assert retrieval == {}
+
+
+def test_no_collection_context_for_unknown_chat(retrieval):
+    request = ChatRequest(chat_id="missing", prompt="Hi", collection={"id": "c1"})
+    assert asyncio.run(get_collection_context(FakeDB(None), request)) is None
+    assert "retrieve" not in retrieval
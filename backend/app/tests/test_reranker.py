@@ -0,0 +1,95 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import services.reranker as reranker_module
+from services.reranker import Reranker, select_mmr
+
+
+def chunk(chunk_id, text):
+    return {"chunk_id": chunk_id, "chunk_text": text, "document_name": f"{chunk_id}.txt"}
+
+
+# a and a2 overlap heavily (3 of 4 words) without being near-duplicates; b shares nothing
+CANDIDATES = [
+    chunk("a", "alpha beta gamma delta"),
+    chunk("a2", "alpha beta gamma"),
+    chunk("b", "zeta eta theta iota"),
+]
+RELEVANCE = np.array([0.9, 0.85, 0.5])
+
+
+def test_mmr_lambda_one_is_relevance_order(monkeypatch):
+    monkeypatch.setattr(reranker_module, "MMR_LAMBDA", 1.0)
+
+    assert select_mmr(CANDIDATES, RELEVANCE, limit=3, token_budget=1000) == [0, 1, 2]
+
+
+def test_mmr_lambda_zero_prefers_diverse_chunks(monkeypatch):
+    monkeypatch.setattr(reranker_module, "MMR_LAMBDA", 0.0)
+
+    assert select_mmr(CANDIDATES, RELEVANCE, limit=2, token_budget=1000) == [0, 2]
+
+
+def test_mmr_drops_near_duplicates(monkeypatch):
+    monkeypatch.setattr(reranker_module, "MMR_LAMBDA", 1.0)
+    candidates = [chunk("a", "alpha beta gamma"), chunk("copy", "Alpha, beta; gamma."), chunk("b", "zeta")]
+
+    assert select_mmr(candidates, np.array([0.9, 0.8, 0.1]), limit=3, token_budget=1000) == [0, 2]
+
+
+def test_mmr_stops_at_token_budget(monkeypatch):
+    monkeypatch.setattr(reranker_module, "MMR_LAMBDA", 1.0)
+    # 40 characters is 10 estimated tokens each
+    candidates = [chunk(str(i), f"word{i} " + "x" * 33) for i in range(4)]
+
+    assert select_mmr(candidates, np.array([0.9, 0.8, 0.7, 0.6]), limit=4, token_budget=25) == [0, 1]
+
+
+def test_mmr_keeps_the_best_chunk_over_budget(monkeypatch):
+    monkeypatch.setattr(reranker_module, "MMR_LAMBDA", 1.0)
+    candidates = [chunk("long", "y" * 400), chunk("short", "z")]
+
+    assert select_mmr(candidates, np.array([0.9, 0.1]), limit=2, token_budget=10) == [0]
+
+
+def test_rerank_keeps_retrieval_order_when_the_model_fails(monkeypatch):
+    calls = []
+
+    def failing_score_pairs(query, texts):
+        calls.append(query)
+        raise OSError("model not available offline")
+
+    monkeypatch.setattr(reranker_module, "score_pairs", failing_score_pairs)
+    reranker = Reranker()
+
+    result = asyncio.run(reranker.rerank("question", CANDIDATES, limit=2))
+    assert [row["chunk_id"] for row in result] == ["a", "a2"]
+    assert all("rerank_score" not in row for row in result)
+    assert reranker.stats()["failures"] == 1
+
+    # Within RERANK_RETRY_AFTER the model isn't tried again
+    result = asyncio.run(reranker.rerank("another question", CANDIDATES, limit=1))
+    assert [row["chunk_id"] for row in result] == ["a"]
+    assert calls == ["question"]
+
+
+def test_rerank_scores_and_caches(monkeypatch):
+    monkeypatch.setattr(reranker_module, "MMR_LAMBDA", 1.0)
+    calls = []
+
+    def score_pairs(query, texts):
+        calls.append(query)
+        return np.array([0.2, 0.1, 0.9])
+
+    monkeypatch.setattr(reranker_module, "score_pairs", score_pairs)
+    reranker = Reranker()
+
+    first = asyncio.run(reranker.rerank("question", CANDIDATES, limit=2))
+    second = asyncio.run(reranker.rerank("question", CANDIDATES, limit=2))
+
+    assert [row["chunk_id"] for row in first] == ["b", "a"]
+    assert first[0]["rerank_score"] == pytest.approx(0.9)
+    assert second == first
+    assert calls == ["question"]
@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import ClientDisconnect
+
+import routers.collections as collections
+import utils.blob_store as blob_store
+from models.collections import UploadComplete, UploadSessionCreate
+
+COLLECTION_ID = "8b0e409f-efc4-44d0-96b6-f3356531a38d"
+USER = SimpleNamespace(id="user-1")
+CONTENT = b"0123456789" * 10
+
+
+class FakeLock:
+    def __init__(self, redis, name):
+        self.redis = redis
+        self.name = name
+
+    def acquire(self):
+        if self.name in self.redis.locks:
+            return False
+        self.redis.locks.add(self.name)
+        return True
+
+    def release(self):
+        self.redis.locks.discard(self.name)
+
+
+class FakeRedis:
+    """The upload session store and upload locks"""
+
+    def __init__(self):
+        self.data = {}
+        self.locks = set()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def lock(self, name, timeout=None, blocking=True):
+        return FakeLock(self, name)
+
+
+class FakeDB:
+    """Owns every collection and accepts the completed document"""
+
+    def __init__(self):
+        self.added = []
+
+    def query(self, model):
+        return SimpleNamespace(filter=lambda *conditions: SimpleNamespace(first=lambda: object()))
+
+    def add(self, document):
+        self.added.append(document)
+
+    def commit(self):
+        pass
+
+    def refresh(self, document):
+        pass
+
+
+class FakeRequest:
+    """A PUT body that arrives in pieces, optionally cut off by a disconnect"""
+
+    def __init__(self, *pieces, disconnect=False):
+        self.pieces = pieces
+        self.disconnect = disconnect
+
+    async def stream(self):
+        for piece in self.pieces:
+            yield piece
+        if self.disconnect:
+            raise ClientDisconnect()
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    redis = FakeRedis()
+    queued = []
+    monkeypatch.setattr(collections, "redis_client", redis)
+    monkeypatch.setattr(collections, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(collections, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    monkeypatch.setattr(collections, "queue_documents_task", lambda collection_id, document_ids, user: queued.append(document_ids) or "task-1")
+    monkeypatch.setattr(collections, "upload_hashers", {})
+    return SimpleNamespace(redis=redis, queued=queued, db=FakeDB())
+
+
+def start(uploads, size=len(CONTENT)):
+    upload = UploadSessionCreate(filename="big.txt", size=size, content_type="text/plain")
+    return asyncio.run(collections.create_upload(COLLECTION_ID, upload, USER, uploads.db))["upload_id"]
+
+
+def put(upload_id, offset, request):
+    return asyncio.run(collections.upload_chunk(COLLECTION_ID, upload_id, request, offset, USER))
+
+
+def complete(uploads, upload_id, sha256=None):
+    return asyncio.run(collections.complete_upload(COLLECTION_ID, upload_id, UploadComplete(sha256=sha256), USER, uploads.db))
+
+
+def status_of(call):
+    with pytest.raises(HTTPException) as error:
+        call()
+    return error.value.status_code
+
+
+def test_offset_mismatch_is_rejected(uploads):
+    upload_id = start(uploads)
+    put(upload_id, 0, FakeRequest(CONTENT[:40]))
+
+    assert status_of(lambda: put(upload_id, 30, FakeRequest(CONTENT[30:]))) == 409
+    assert status_of(lambda: complete(uploads, upload_id)) == 409
+    assert asyncio.run(collections.get_upload(COLLECTION_ID, upload_id, USER))["offset"] == 40
+
+
+def test_chunk_past_declared_size_is_rejected(uploads):
+    upload_id = start(uploads, size=50)
+
+    assert status_of(lambda: put(upload_id, 0, FakeRequest(CONTENT[:40], CONTENT[40:60]))) == 413
+    # The bytes before the oversized piece are kept
+    assert asyncio.run(collections.get_upload(COLLECTION_ID, upload_id, USER))["offset"] == 40
+
+
+def test_sha256_mismatch_is_rejected(uploads):
+    upload_id = start(uploads)
+    put(upload_id, 0, FakeRequest(CONTENT))
+
+    assert status_of(lambda: complete(uploads, upload_id, sha256="0" * 64)) == 422
+    assert uploads.db.added == []
+    assert uploads.queued == []
+
+
+def test_resume_after_disconnect(uploads):
+    upload_id = start(uploads)
+    with pytest.raises(ClientDisconnect):
+        put(upload_id, 0, FakeRequest(CONTENT[:30], CONTENT[30:55], disconnect=True))
+
+    # The client asks where to resume and sends the rest from there
+    offset = asyncio.run(collections.get_upload(COLLECTION_ID, upload_id, USER))["offset"]
+    assert offset == 55
+    assert put(upload_id, offset, FakeRequest(CONTENT[offset:]))["offset"] == len(CONTENT)
+
+    sha256 = hashlib.sha256(CONTENT).hexdigest()
+    document = complete(uploads, upload_id, sha256=sha256.upper())
+    assert document.sha256 == sha256 and document.task_id == "task-1"
+    with open(document.file_path, "rb") as f:
+        assert f.read() == CONTENT
+    assert len(uploads.queued) == 1
+
+    # The session is gone, so a retried complete can't ingest the upload twice
+    assert status_of(lambda: complete(uploads, upload_id, sha256=sha256)) == 404
+
+
+def test_resume_on_another_process_rehashes_from_disk(uploads):
+    upload_id = start(uploads)
+    put(upload_id, 0, FakeRequest(CONTENT[:60]))
+    collections.upload_hashers.clear()
+
+    put(upload_id, 60, FakeRequest(CONTENT[60:]))
+
+    assert complete(uploads, upload_id).sha256 == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_requests_holding_the_upload_are_rejected(uploads):
+    upload_id = start(uploads)
+    put(upload_id, 0, FakeRequest(CONTENT))
+    uploads.redis.locks.add(f"upload_lock:{upload_id}")
+
+    assert status_of(lambda: put(upload_id, len(CONTENT), FakeRequest(b""))) == 409
+    assert status_of(lambda: complete(uploads, upload_id)) == 409
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+import services.vector_search as vector_search
+from services.vector_search import format_context, reciprocal_rank_fusion, retrieve_collections_context
+
+
+def chunk(chunk_id, similarity=0.0, collection_id="c1"):
+    return {
+        "chunk_id": chunk_id,
+        "chunk_text": f"text of {chunk_id}",
+        "chunk_index": 0,
+        "document_name": f"{chunk_id}.txt",
+        "document_id": f"doc-{chunk_id}",
+        "collection_name": f"collection {collection_id}",
+        "collection_id": collection_id,
+        "similarity": similarity,
+    }
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Stub the query embedding and both per-collection searches, recording the calls"""
+    calls = {"embed": 0, "vector": [], "text": []}
+
+    async def embed(query_text):
+        calls["embed"] += 1
+        return [0.1, 0.2, 0.3]
+
+    def by_vector(collection_id, query_embedding, limit, ef_search=None, probes=None):
+        calls["vector"].append((collection_id, limit))
+        return [chunk("a", 0.9, collection_id), chunk("b", 0.8, collection_id)]
+
+    def by_text(collection_id, query_text, limit):
+        calls["text"].append((collection_id, query_text, limit))
+        return [chunk("b", 0.5, collection_id), chunk("c", 0.4, collection_id)]
+
+    monkeypatch.setattr(vector_search, "generate_embedding", embed)
+    monkeypatch.setattr(vector_search, "search_chunks_by_vector", by_vector)
+    monkeypatch.setattr(vector_search, "search_chunks_by_text", by_text)
+    monkeypatch.setattr(vector_search, "RETRIEVAL_CACHE_ENABLED", False)
+    monkeypatch.setattr(vector_search, "RERANK_ENABLED", False)
+    return calls
+
+
+def test_rrf_ranks_chunks_found_by_both_searches_first():
+    fused = reciprocal_rank_fusion([[chunk("a"), chunk("b")], [chunk("b"), chunk("c")]], limit=3, k=60)
+
+    assert [row["chunk_id"] for row in fused] == ["b", "a", "c"]
+    assert fused[0]["similarity"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[1]["similarity"] == pytest.approx(1 / 61)
+
+
+def test_rrf_ties_keep_first_seen_order_and_limit():
+    # a and c are both first in their list; b and d both second
+    fused = reciprocal_rank_fusion([[chunk("a"), chunk("b")], [chunk("c"), chunk("d")]], limit=3)
+
+    assert [row["chunk_id"] for row in fused] == ["a", "c", "b"]
+    assert fused[0]["similarity"] == fused[1]["similarity"]
+
+
+def test_rrf_keeps_the_first_row_of_each_chunk():
+    fused = reciprocal_rank_fusion([[chunk("a", 0.9)], [dict(chunk("a", 0.1), chunk_text="other")]], limit=1)
+
+    assert fused[0]["chunk_text"] == "text of a"
+
+
+def test_lexical_search_needs_no_embedding(searches):
+    result = asyncio.run(vector_search.search_collections(["c1"], "error E1234", limit=2, mode="lexical"))
+
+    assert [row["chunk_id"] for row in result] == ["b", "c"]
+    assert searches["embed"] == 0
+    assert searches["vector"] == []
+    assert searches["text"] == [("c1", "error E1234", 2)]
+
+
+def test_lexical_context_without_matches(searches, monkeypatch):
+    monkeypatch.setattr(vector_search, "search_chunks_by_text", lambda collection_id, query_text, limit: [])
+
+    context = asyncio.run(retrieve_collections_context(["c1"], "nothing", mode="lexical"))
+
+    assert context == "Note: No document chunks in collection c1 match the query."
+
+
+def test_vector_is_the_default_mode(searches):
+    assert vector_search.RETRIEVAL_MODE == "vector"
+
+    context = asyncio.run(retrieve_collections_context(["c1"], "question", limit=1))
+
+    assert "Similarity: 0.9000" in context
+    assert searches["text"] == []
+
+
+def test_hybrid_context_labels_fusion_scores(searches):
+    context = asyncio.run(retrieve_collections_context(["c1"], "question", limit=2, mode="hybrid"))
+
+    assert searches["vector"] == [("c1", vector_search.HYBRID_CANDIDATES)]
+    assert context.startswith("Context:\nDocument: b.txt\nFusion score: ")
+    assert "Similarity" not in context
+
+
+def test_context_labels_by_mode():
+    rows = [chunk("a", 0.25)]
+
+    assert "Text rank: 0.2500" in format_context(rows, mode="lexical")
+    assert "Fusion score: 0.2500" in format_context(rows, mode="hybrid")
+    assert "Relevance: 3.5000" in format_context([dict(rows[0], rerank_score=3.5)], mode="hybrid")
@@ -0,0 +1,116 @@
+"""
+Content-addressed storage for uploaded documents.
+
+Every distinct file is kept once, at BLOB_DIR/<sha[0:2]>/<sha[2:4]>/<sha>. A document's
+file_path (DATA_DIR/<collection_id>/<uuid><ext>) is a hard link to its blob, so the same
+file in ten collections takes the space of one and existing readers of file_path are
+unaffected. collections.documents.content_hash is the reference count: a blob no document
+points at is removed by collect_garbage.
+"""
+
+import os
+import time
+import errno
+import shutil
+import hashlib
+from typing import Set
+
+from sqlalchemy import text
+
+from logger import get_logger
+
+logger = get_logger("blob_store")
+
+# =============== Environment Variables ===============
+DATA_DIR = os.getenv("DATA_DIR", ".")
+BLOB_DIR = os.getenv("BLOB_DIR", os.path.join(DATA_DIR, "blobs"))
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))  # never collect blobs younger than this
+HASH_READ_SIZE = 1024 * 1024
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], sha256)
+
+def hash_file(path: str) -> str:
+    """SHA-256 hex digest of a file"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(HASH_READ_SIZE), b""):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+def store_blob(source_path: str, sha256: str) -> str:
+    """
+    Move a fully written file into the store under its hash and return the blob path.
+    If an identical blob already exists the source file is discarded instead, and the
+    blob is touched so a concurrent collect_garbage treats it as recently used.
+    """
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.utime(path)
+        os.remove(source_path)
+        logger.debug(f"Blob {sha256} already stored")
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        os.replace(source_path, path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # Staging directory on another filesystem
+        shutil.copyfile(source_path, path)
+        os.remove(source_path)
+    return path
+
+def link_blob(sha256: str, dest_path: str):
+    """Make dest_path refer to the blob: a hard link, or a copy when the filesystem can't link"""
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    try:
+        os.link(blob_path(sha256), dest_path)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+        logger.warning(f"Hard link to blob {sha256} failed ({e.strerror}); copying instead")
+        shutil.copyfile(blob_path(sha256), dest_path)
+
+def ingest_file(source_path: str, sha256: str, dest_path: str) -> bool:
+    """
+    Store a newly received file by content and link it at dest_path.
+    Returns True if identical content was already stored (nothing new on disk).
+    """
+    existed = os.path.exists(blob_path(sha256))
+    store_blob(source_path, sha256)
+    link_blob(sha256, dest_path)
+    return existed
+
+def referenced_hashes(db) -> Set[str]:
+    rows = db.execute(text("""
+        SELECT DISTINCT content_hash
+        FROM collections.documents
+        WHERE content_hash IS NOT NULL
+    """)).fetchall()
+    return {row.content_hash for row in rows}
+
+def collect_garbage(db, grace_seconds: int = BLOB_GC_GRACE_SECONDS, dry_run: bool = False) -> dict:
+    """
+    Remove blobs that no document references. Blobs modified in the last grace_seconds are
+    kept, since an upload may have stored one and not yet committed its document.
+    """
+    referenced = referenced_hashes(db)
+    cutoff = time.time() - grace_seconds
+    removed, kept, freed = 0, 0, 0
+    for directory, _, filenames in os.walk(BLOB_DIR):
+        for sha256 in filenames:
+            path = os.path.join(directory, sha256)
+            stat = os.stat(path)
+            if sha256 in referenced or stat.st_mtime > cutoff:
+                kept += 1
+                continue
+            if stat.st_nlink > 1:
+                # A document file still links to it (e.g. a row deleted outside the API); its space isn't freed yet
+                logger.info(f"Blob {sha256} is unreferenced but still has {stat.st_nlink - 1} file links")
+            if not dry_run:
+                os.remove(path)
+            removed += 1
+            freed += stat.st_size if stat.st_nlink == 1 else 0
+    logger.info(f"Blob GC: removed {removed}, kept {kept}, freed {freed} bytes{' (dry run)' if dry_run else ''}")
+    return {"removed": removed, "kept": kept, "freed_bytes": freed}
@@ -1,12 +1,59 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
+# =============== Environment Variables ===============
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # cost factor; each +1 doubles the time per hash
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))  # waiting jobs before 503
+PASSWORD_HASH_RETRY_AFTER = 2  # seconds
+
 # ✅ Configure bcrypt hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with a different cost still verify; pinning min/max to BCRYPT_ROUNDS makes
+# verify_and_update report them as needing a rehash
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+# bcrypt runs on its own small pool rather than the shared request threadpool, so a burst
+# of logins uses at most PASSWORD_HASH_WORKERS cores and can't starve other requests
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+password_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_LIMIT)
+
+def submit_password_job(fn, *args):
+    """Run fn on the bcrypt pool, or reject with 503 when its queue is full"""
+    if not password_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, please retry shortly",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)}
+        )
+    try:
+        future = password_executor.submit(fn, *args)
+    except Exception:
+        password_slots.release()
+        raise
+    future.add_done_callback(lambda _: password_slots.release())
+    return future
 
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt."""
-    return pwd_context.hash(password)
+    return submit_password_job(pwd_context.hash, password).result()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return submit_password_job(pwd_context.verify, plain_password, hashed_password).result()
+
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """
+    Verify a password. Returns (valid, new_hash); new_hash is set when the stored hash
+    uses a different cost than BCRYPT_ROUNDS and should be replaced.
+    """
+    return submit_password_job(pwd_context.verify_and_update, plain_password, hashed_password).result()
@@ -136,6 +136,11 @@ CREATE TABLE collections.collections (
     type TEXT NOT NULL,
     description TEXT,
     is_encrypted BOOLEAN DEFAULT FALSE,
+    -- Precision of the ANN index: vector (float32), halfvec (float16) or bit (binary quantized).
+    -- document_chunks always keeps the full vector for re-ranking.
+    embedding_storage TEXT NOT NULL DEFAULT 'vector' CHECK (embedding_storage IN ('vector', 'halfvec', 'bit')),
+    -- Bumped by the embedding worker whenever a document finishes; keys the retrieval result cache
+    version BIGINT NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -151,27 +156,63 @@ CREATE TABLE collections.documents (
     is_encrypted BOOLEAN DEFAULT FALSE,
     status TEXT,
     metadata JSONB,
+    content_hash TEXT,  -- sha256 of the file, naming its blob under DATA_DIR/blobs
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
 -- Document chunks with vector embeddings
+-- Hash-partitioned by collection into a fixed number of partitions, so the partition count
+-- (and planning time) does not grow with the number of collections. Retrieval scoped to one
+-- collection prunes to one partition and uses that collection's partial ANN index.
 CREATE TABLE collections.document_chunks (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    collection_id UUID NOT NULL REFERENCES collections.collections(id) ON DELETE CASCADE,
     document_id UUID NOT NULL REFERENCES collections.documents(id) ON DELETE CASCADE,
     chunk_index INTEGER NOT NULL,
     chunk_text TEXT NOT NULL,
-    embedding vector(768),
+    -- Must match EMBEDDING_DIMENSION (1024 for the default intfloat/multilingual-e5-large-instruct)
+    embedding vector(1024),
     metadata JSONB,
+    search_tsv tsvector,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (collection_id, id)
+) PARTITION BY HASH (collection_id);
+
+DO $$
+BEGIN
+    FOR i IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE collections.document_chunks_p%s PARTITION OF collections.document_chunks FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            lpad(i::text, 2, '0'), i
+        );
+    END LOOP;
+END $$;
+
+-- Cross-document embedding cache keyed by (model, sha256 of chunk text)
+CREATE TABLE collections.embedding_cache (
+    model_name TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    embedding vector NOT NULL,
+    hit_count BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (model_name, content_hash)
 );
 
 -- Create indexes for performance
 CREATE INDEX idx_documents_collection_id ON collections.documents(collection_id);
+CREATE INDEX idx_documents_collection_created ON collections.documents(collection_id, created_at, id);
+CREATE INDEX idx_documents_content_hash ON collections.documents(content_hash);
 CREATE INDEX idx_document_chunks_document_id ON collections.document_chunks(document_id);
+-- Full-text index for lexical and hybrid retrieval (tsvector maintained by the embedding worker)
+CREATE INDEX idx_document_chunks_search_tsv ON collections.document_chunks USING gin (search_tsv);
 CREATE INDEX idx_collections_user_id ON collections.collections(user_id);
+CREATE INDEX idx_embedding_cache_last_used_at ON collections.embedding_cache(last_used_at);
 
 -- Create vector index for similarity searches
-CREATE INDEX embedding_idx ON collections.document_chunks USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 100);
\ No newline at end of file
+-- The embedding worker builds one partial ANN index per collection once it reaches
+-- VECTOR_INDEX_MIN_ROWS chunks (HNSW by default; ivfflat with lists sized from the
+-- collection's row count when VECTOR_INDEX_TYPE=ivfflat). Smaller collections are
+-- searched exactly through the primary key, so no index is created up front.
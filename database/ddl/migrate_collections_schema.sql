@@ -0,0 +1,39 @@
+-- Bring an existing collections schema up to date with init_local_with_embeddings.sql.
+-- Safe to re-run. The embedding worker checks for these columns at startup and refuses
+-- to start without them; it does not alter the schema itself.
+
+BEGIN;
+
+-- Precision of each collection's ANN index, and the version keying the retrieval cache
+ALTER TABLE collections.collections
+    ADD COLUMN IF NOT EXISTS embedding_storage TEXT NOT NULL DEFAULT 'vector'
+        CHECK (embedding_storage IN ('vector', 'halfvec', 'bit')),
+    ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+
+-- sha256 of the uploaded file, naming its blob under DATA_DIR/blobs
+ALTER TABLE collections.documents
+    ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Full-text vector for lexical and hybrid retrieval, filled in by the embedding worker
+ALTER TABLE collections.document_chunks
+    ADD COLUMN IF NOT EXISTS search_tsv tsvector;
+-- Partitioned tables cannot be indexed concurrently
+CREATE INDEX IF NOT EXISTS idx_document_chunks_search_tsv ON collections.document_chunks USING gin (search_tsv);
+
+-- Cross-document embedding cache keyed by (model, sha256 of chunk text)
+CREATE TABLE IF NOT EXISTS collections.embedding_cache (
+    model_name TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    embedding vector NOT NULL,
+    hit_count BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (model_name, content_hash)
+);
+
+COMMIT;
+
+-- Built outside the transaction, without blocking writes to the tables
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_documents_collection_created ON collections.documents(collection_id, created_at, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_documents_content_hash ON collections.documents(content_hash);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_embedding_cache_last_used_at ON collections.embedding_cache(last_used_at);
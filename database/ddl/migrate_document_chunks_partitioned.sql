@@ -0,0 +1,71 @@
+-- Migrate an existing collections.document_chunks table (unpartitioned, or partitioned
+-- by LIST with one partition per collection) to the hash-partitioned layout of
+-- init_local_with_embeddings.sql. Apply migrate_collections_schema.sql first.
+-- Old ANN indexes are dropped with the old table; the embedding worker rebuilds the
+-- per-collection partial indexes as collections are next processed.
+--
+-- The new embedding column is vector(1024), the dimension of the default
+-- intfloat/multilingual-e5-large-instruct. Deployments created with the old defaults hold
+-- 768-dimension e5-base vectors, and a model change always means re-embedding: chunks
+-- whose embedding has another dimension are copied with a NULL embedding, and their
+-- documents lose their status so they show as not processed. Queue those documents (or
+-- their collections) through POST /embeddings afterwards to re-embed them; the worker
+-- replaces chunks without an embedding.
+
+BEGIN;
+
+ALTER TABLE collections.document_chunks RENAME TO document_chunks_old;
+DROP INDEX IF EXISTS collections.embedding_idx;
+DROP INDEX IF EXISTS collections.idx_document_chunks_document_id;
+DROP INDEX IF EXISTS collections.idx_document_chunks_search_tsv;
+
+CREATE TABLE collections.document_chunks (
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
+    collection_id UUID NOT NULL REFERENCES collections.collections(id) ON DELETE CASCADE,
+    document_id UUID NOT NULL REFERENCES collections.documents(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    chunk_text TEXT NOT NULL,
+    -- Must match EMBEDDING_DIMENSION (1024 for the default intfloat/multilingual-e5-large-instruct)
+    embedding vector(1024),
+    metadata JSONB,
+    search_tsv tsvector,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (collection_id, id)
+) PARTITION BY HASH (collection_id);
+
+DO $$
+BEGIN
+    FOR i IN 0..15 LOOP
+        EXECUTE format(
+            'CREATE TABLE collections.document_chunks_p%s PARTITION OF collections.document_chunks FOR VALUES WITH (MODULUS 16, REMAINDER %s)',
+            lpad(i::text, 2, '0'), i
+        );
+    END LOOP;
+END $$;
+
+INSERT INTO collections.document_chunks
+    (id, collection_id, document_id, chunk_index, chunk_text, embedding, metadata, search_tsv, created_at, updated_at)
+SELECT dc.id, d.collection_id, dc.document_id, dc.chunk_index, dc.chunk_text,
+       CASE WHEN vector_dims(dc.embedding) = 1024 THEN dc.embedding END,
+       dc.metadata, to_tsvector('simple', dc.chunk_text), dc.created_at, dc.updated_at
+FROM collections.document_chunks_old dc
+JOIN collections.documents d ON d.id = dc.document_id;
+
+-- Documents embedded with another model need re-embedding
+UPDATE collections.documents d
+SET status = NULL,
+    metadata = jsonb_set(COALESCE(d.metadata, '{}'::jsonb), '{processed_chunks}', '0'),
+    updated_at = CURRENT_TIMESTAMP
+WHERE EXISTS (
+    SELECT 1 FROM collections.document_chunks_old dc
+    WHERE dc.document_id = d.id AND vector_dims(dc.embedding) <> 1024
+);
+
+CREATE INDEX idx_document_chunks_document_id ON collections.document_chunks(document_id);
+CREATE INDEX idx_document_chunks_search_tsv ON collections.document_chunks USING gin (search_tsv);
+
+-- Drops the old per-collection partitions and their indexes along with it
+DROP TABLE collections.document_chunks_old CASCADE;
+
+COMMIT;
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+CPU Embedding Benchmark
+-----------------------
+Measures chunks/sec of the embedding model on CPU in fp32 and with dynamic int8
+quantization, and how closely the quantized embeddings agree with fp32 (cosine).
+
+Usage: python scripts/bench_cpu_embeddings.py --chunks 256 --batch-sizes 1,8,16,32 --threads 8
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from embedding_worker import EmbeddingModel, MODEL_NAME, CHUNK_SIZE, chunk_document_text
+
+WORDS = (
+    "agreement party shall obligations termination notice payment invoice delivery warranty "
+    "liability confidential information services period renewal clause section schedule "
+    "vertrag partei zahlung lieferung kündigung contrat paiement livraison résiliation "
+    "contrato pago entrega rescisión system error code request response server client"
+).split()
+
+
+def make_chunks(count, seed=0):
+    """Generate synthetic document text and chunk it the same way the worker does"""
+    rng = random.Random(seed)
+    chunks = []
+    while len(chunks) < count:
+        text = " ".join(rng.choice(WORDS) for _ in range(CHUNK_SIZE))
+        chunks.extend(chunk_document_text(text))
+    return chunks[:count]
+
+
+def throughput(model, chunks, batch_size):
+    # Warm up once so lazy initialisation doesn't count against the first batch size
+    model.embed(chunks[:batch_size], batch_size=batch_size)
+    start = time.perf_counter()
+    embeddings = model.embed(chunks, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return len(chunks) / elapsed, embeddings
+
+
+def cosine_agreement(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--chunks", type=int, default=256)
+    parser.add_argument("--batch-sizes", default="1,8,16,32")
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    args = parser.parse_args()
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    chunks = make_chunks(args.chunks)
+    print(f"Model: {args.model}, chunks: {len(chunks)}, threads: {args.threads or 'default'}")
+
+    fp32_model = EmbeddingModel(model_name=args.model, device="cpu", quantize=False, num_threads=args.threads)
+    int8_model = EmbeddingModel(model_name=args.model, device="cpu", quantize=True, num_threads=args.threads)
+
+    print(f"\n{'batch':>6} {'fp32 chunks/s':>15} {'int8 chunks/s':>15} {'speedup':>8}")
+    fp32_embeddings = int8_embeddings = None
+    for batch_size in batch_sizes:
+        fp32_rate, fp32_embeddings = throughput(fp32_model, chunks, batch_size)
+        int8_rate, int8_embeddings = throughput(int8_model, chunks, batch_size)
+        print(f"{batch_size:>6} {fp32_rate:>15.2f} {int8_rate:>15.2f} {int8_rate / fp32_rate:>7.2f}x")
+
+    agreement = cosine_agreement(fp32_embeddings, int8_embeddings)
+    print("\nCosine agreement int8 vs fp32:")
+    print(f"  mean: {agreement.mean():.4f}  min: {agreement.min():.4f}  p5: {np.percentile(agreement, 5):.4f}")
+
+
+if __name__ == "__main__":
+    main()
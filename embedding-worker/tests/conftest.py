@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The worker is a single module run from its own directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
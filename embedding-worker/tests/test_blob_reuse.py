@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+from embedding_worker import EmbeddingWorker
+
+
+class FakeResult:
+    def __init__(self, value=None, rowcount=0):
+        self.value = value
+        self.rowcount = rowcount
+
+    def scalar(self):
+        return self.value
+
+    def fetchone(self):
+        return self.value
+
+
+class FakeDB:
+    """Replays one result per statement, recording the statements and their parameters"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append((str(statement), params))
+        return self.results.pop(0)
+
+
+def fake_worker():
+    """Just the collaborators copy_chunks_from_identical_blob uses"""
+    calls = {"touched": [], "completed": []}
+    worker = SimpleNamespace(
+        touch_collection=calls["touched"].append,
+        complete_document=lambda db, document_id, collection_id, total, reused, copied_from=None:
+            calls["completed"].append((document_id, collection_id, total, reused, copied_from)),
+        log_with_context=lambda message: None,
+    )
+    return worker, calls
+
+
+def copy(worker, db):
+    return EmbeddingWorker.copy_chunks_from_identical_blob(worker, db, "doc-new", "c2", "sha")
+
+
+def test_identical_document_chunks_are_copied():
+    worker, calls = fake_worker()
+    source = SimpleNamespace(id="doc-old", collection_id="c1")
+    db = FakeDB(FakeResult(False), FakeResult(source), FakeResult(rowcount=7))
+
+    assert copy(worker, db) == 7
+
+    copy_sql, params = db.statements[2]
+    assert "INSERT INTO collections.document_chunks" in copy_sql and "embedding IS NOT NULL" in copy_sql
+    assert params["source_collection_id"] == "c1" and params["source_document_id"] == "doc-old"
+    assert params["collection_id"] == "c2" and params["document_id"] == "doc-new"
+    assert calls["completed"] == [("doc-new", "c2", 7, 7, "doc-old")]
+    assert calls["touched"] == ["c2"]
+
+
+def test_only_completed_embedded_documents_are_sources():
+    worker, calls = fake_worker()
+    db = FakeDB(FakeResult(False), FakeResult(None))
+
+    assert copy(worker, db) is None
+
+    source_sql, params = db.statements[1]
+    assert "d.status = 'completed'" in source_sql and "dc.embedding IS NOT NULL" in source_sql
+    assert params == {"content_hash": "sha", "document_id": "doc-new"}
+    assert calls["completed"] == []
+
+
+def test_documents_with_chunks_are_not_overwritten():
+    worker, calls = fake_worker()
+    db = FakeDB(FakeResult(True))
+
+    assert copy(worker, db) is None
+    assert len(db.statements) == 1
+    assert calls == {"touched": [], "completed": []}
@@ -129,10 +129,18 @@ export const collectionsService = {
   async getDocuments(collectionId: string): Promise<Document[]> {
     return withAuth(async () => {
       try {
-        const response = await axios.get(`${BASE_URL}/collections/${collectionId}/documents`, {
-          withCredentials: true
-        });
-        return response.data;
+        // The list is paginated; follow X-Next-Cursor until the last page
+        const documents: Document[] = [];
+        let cursor: string | undefined;
+        do {
+          const response = await axios.get(`${BASE_URL}/collections/${collectionId}/documents`, {
+            params: { limit: 1000, ...(cursor ? { cursor } : {}) },
+            withCredentials: true
+          });
+          documents.push(...response.data);
+          cursor = response.headers['x-next-cursor'];
+        } while (cursor);
+        return documents;
       } catch (error) {
         console.error(`Error fetching documents for collection ${collectionId}:`, error);
         throw error;